@@ -3,10 +3,11 @@
 
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier, HistGradientBoostingClassifier
 from sklearn.neural_network import MLPClassifier
 from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import cross_val_score
+from sklearn.model_selection import TimeSeriesSplit
+from sklearn.base import BaseEstimator, clone
 from collections import Counter, defaultdict
 import json
 import traceback
@@ -14,15 +15,2085 @@ import gc
 from datetime import datetime, timedelta
 import requests
 import io
+import os
+import pickle
+import hashlib
+import heapq
+import itertools
+import time
+import threading
+import queue
+import multiprocessing
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
 
 print("🚀 ミニロト予測システム - パート1A: 基盤システム（前半）")
 print("🎯 対象: ミニロト（1-31から5個選択 + ボーナス1個）")
 print("📊 特徴量: 14次元最適化版")
 print("🔧 固定窓: 50回分に調整")
 
+# ミニロト用カラム型抽選データストア
+class MiniLotoDrawStore:
+    """抽選データを列指向のNumPy配列で保持（本数字は(N, 5) uint8）"""
+    main_columns = ['第1数字', '第2数字', '第3数字', '第4数字', '第5数字']
+    bonus_column = 'ボーナス数字'
+    round_column = '開催回'
+    date_column = '日付'
+    
+    def __init__(self, numbers, bonus, rounds, dates, valid_mask=None, date_index=None, feature_matrix=None):
+        self.numbers = numbers    # (N, 5) uint8
+        self.bonus = bonus        # (N,) uint8
+        self.rounds = rounds      # (N,) int32（昇順）
+        self.dates = dates        # (N,) object（表示用文字列）
+        # 有効行マスク（取り込み時に一度だけ検証）
+        self.valid_mask = self.validate_numbers(numbers) if valid_mask is None else valid_mask
+        # 開催日の昇順datetime64[D]索引（取り込み時に一度だけ解析）
+        self.date_index = self.parse_dates(dates) if date_index is None else date_index
+        # 全行の14次元特徴量（特徴量ストアから付与、スライスはビューを共有）
+        self.feature_matrix = feature_matrix
+        self._clean_numbers = None
+    
+    @staticmethod
+    def parse_dates(dates):
+        """日付文字列をdatetime64[D]に一括変換（解析不能な日付は直前の日付で補完し単調増加に揃える）"""
+        if len(dates) == 0:
+            return np.zeros(0, dtype='datetime64[D]')
+        parsed = pd.to_datetime(pd.Series(dates, dtype=object), errors='coerce', format='mixed')
+        days = parsed.to_numpy(dtype='datetime64[D]').astype(np.int64)
+        nat = np.iinfo(np.int64).min
+        if (days == nat).all():
+            return np.full(len(days), np.datetime64('NaT'), dtype='datetime64[D]')
+        # 先頭の欠損は最初の有効日付で埋め、以降は累積最大で前方補完
+        if days[0] == nat:
+            days[0] = days[days != nat][0]
+        return np.maximum.accumulate(days).astype('datetime64[D]')
+    
+    @staticmethod
+    def validate_numbers(numbers):
+        """範囲（1-31）と5数字の重複なしを一括検証して有効行マスクを返す"""
+        numbers = np.asarray(numbers)
+        if len(numbers) == 0:
+            return np.zeros(0, dtype=bool)
+        in_range = ((numbers >= 1) & (numbers <= 31)).all(axis=1)
+        distinct = (np.diff(np.sort(numbers, axis=1).astype(np.int16), axis=1) != 0).all(axis=1)
+        return in_range & distinct
+    
+    @property
+    def clean_numbers(self):
+        """有効行のみの本数字（全行有効ならゼロコピービュー）"""
+        if self._clean_numbers is None:
+            self._clean_numbers = self.numbers if self.valid_mask.all() else self.numbers[self.valid_mask]
+        return self._clean_numbers
+    
+    @property
+    def valid_count(self):
+        """有効行数"""
+        return int(np.count_nonzero(self.valid_mask))
+    
+    def number_counts(self):
+        """有効行の数字別出現回数（数字→回数）"""
+        counts = np.bincount(self.clean_numbers.ravel(), minlength=32)
+        return {int(num): int(counts[num]) for num in np.flatnonzero(counts[1:32]) + 1}
+    
+    def sum_stats(self):
+        """有効行の合計値の平均・標準偏差（有効行がなければNone）"""
+        if len(self.clean_numbers) == 0:
+            return None
+        sums = self.clean_numbers.sum(axis=1, dtype=np.int64)
+        return float(np.mean(sums)), float(np.std(sums))
+    
+    @classmethod
+    def from_dataframe(cls, df):
+        """正規化済みデータフレームから一括変換（開催回昇順に整列）"""
+        if len(df) > 0 and not df[cls.round_column].is_monotonic_increasing:
+            df = df.sort_values(cls.round_column, kind='stable')
+        
+        numbers = np.nan_to_num(df[cls.main_columns].to_numpy(dtype=np.float64), nan=0.0)
+        numbers[numbers != np.floor(numbers)] = 0  # 非整数値は無効値（0）扱い
+        bonus = np.nan_to_num(df[cls.bonus_column].to_numpy(dtype=np.float64), nan=0.0)
+        
+        return cls(
+            np.ascontiguousarray(np.clip(numbers, 0, 255).astype(np.uint8)),
+            np.clip(bonus, 0, 255).astype(np.uint8),
+            df[cls.round_column].to_numpy(dtype=np.int32),
+            df[cls.date_column].astype(str).to_numpy(dtype=object) if cls.date_column in df.columns
+            else np.full(len(df), 'N/A', dtype=object)
+        )
+    
+    @classmethod
+    def from_data(cls, data):
+        """データフレーム・ストアのどちらでも受け付けてストアを返す"""
+        if isinstance(data, cls):
+            return data
+        return cls.from_dataframe(data)
+    
+    def __len__(self):
+        return len(self.rounds)
+    
+    def rows(self, start, stop):
+        """行範囲のゼロコピースライス"""
+        return type(self)(
+            self.numbers[start:stop], self.bonus[start:stop],
+            self.rounds[start:stop], self.dates[start:stop],
+            self.valid_mask[start:stop], self.date_index[start:stop],
+            None if self.feature_matrix is None else self.feature_matrix[start:stop]
+        )
+    
+    def pair_matrix(self, start=0, stop=None):
+        """行範囲[start, stop)の有効行のペア共起行列（累積行列から差分で取得）"""
+        if getattr(self, '_pair_cumulative', None) is None:
+            self._pair_cumulative = MiniLotoPairMatrix.cumulative(self.numbers, self.valid_mask)
+        return MiniLotoPairMatrix.window(self._pair_cumulative, start, len(self) if stop is None else stop)
+    
+    def ensure_features(self):
+        """特徴量が未付与なら全行分を一度だけ計算して保持"""
+        if self.feature_matrix is None:
+            self.feature_matrix = MiniLotoFeatureEngine.compute(self.numbers)
+        return self.feature_matrix
+    
+    def round_bounds(self, first_round=None, last_round=None):
+        """開催回範囲 [first_round, last_round] に対応する行範囲を二分探索で取得"""
+        start = 0 if first_round is None else int(np.searchsorted(self.rounds, first_round, side='left'))
+        stop = len(self.rounds) if last_round is None else int(np.searchsorted(self.rounds, last_round, side='right'))
+        return start, max(start, stop)
+    
+    def slice_rounds(self, first_round=None, last_round=None):
+        """開催回範囲のゼロコピースライス"""
+        return self.rows(*self.round_bounds(first_round, last_round))
+    
+    @property
+    def has_dates(self):
+        """開催日索引が利用可能か"""
+        return len(self.date_index) > 0 and not np.isnat(self.date_index[-1])
+    
+    def date_bounds(self, start_date=None, end_date=None):
+        """開催日範囲 [start_date, end_date] に対応する行範囲を二分探索で取得"""
+        start = 0 if start_date is None else int(np.searchsorted(
+            self.date_index, np.datetime64(start_date, 'D'), side='left'))
+        stop = len(self.date_index) if end_date is None else int(np.searchsorted(
+            self.date_index, np.datetime64(end_date, 'D'), side='right'))
+        return start, max(start, stop)
+    
+    def slice_dates(self, start_date=None, end_date=None):
+        """開催日範囲のゼロコピースライス"""
+        return self.rows(*self.date_bounds(start_date, end_date))
+    
+    def since(self, start_date):
+        """指定日以降の抽選（ゼロコピースライス）"""
+        return self.slice_dates(start_date=start_date)
+    
+    def weeks_start(self, stop, weeks):
+        """行stopの開催日から遡ってweeks週以内に入る最初の行番号"""
+        if stop >= len(self.date_index):
+            anchor = self.date_index[-1] + np.timedelta64(1, 'D')
+        else:
+            anchor = self.date_index[stop]
+        return int(np.searchsorted(
+            self.date_index[:stop], anchor - np.timedelta64(7 * weeks, 'D'), side='left'))
+    
+    def last_weeks(self, weeks):
+        """直近weeks週分の抽選（ゼロコピースライス）"""
+        return self.rows(self.weeks_start(len(self), weeks), len(self))
+    
+    @property
+    def round_index(self):
+        """開催回→行番号の索引（初回参照時に構築）"""
+        if getattr(self, '_round_index', None) is None:
+            self._round_index = {int(r): i for i, r in enumerate(self.rounds.tolist())}
+        return self._round_index
+    
+    def find_row(self, round_number):
+        """指定開催回の行番号をO(1)で取得（なければ-1）"""
+        return self.round_index.get(int(round_number), -1)
+    
+    def lookup_rows(self, round_numbers):
+        """複数開催回の行番号を一括取得（なければ-1）"""
+        round_numbers = np.asarray(round_numbers, dtype=np.int64)
+        if len(self.rounds) == 0:
+            return np.full(len(round_numbers), -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.rounds, round_numbers), len(self.rounds) - 1)
+        return np.where(self.rounds[pos] == round_numbers, pos, -1)
+    
+    def get_numbers(self, round_number):
+        """指定開催回の本数字リスト（なければNone）"""
+        row = self.find_row(round_number)
+        return self.numbers[row].tolist() if row >= 0 else None
+    
+    @staticmethod
+    def match_counts(predicted_sets, actual_sets):
+        """予測セット(M, 5)と当選番号(M, 5)の一致数を一括計算"""
+        predicted_sets = np.asarray(predicted_sets, dtype=np.int16)
+        actual_sets = np.asarray(actual_sets, dtype=np.int16)
+        return (predicted_sets[:, :, None] == actual_sets[:, None, :]).sum(axis=(1, 2))
+    
+    def to_dataframe(self):
+        """従来形式のデータフレームに戻す（表示・エクスポート用）"""
+        data = {self.round_column: self.rounds, self.date_column: self.dates}
+        for j, col in enumerate(self.main_columns):
+            data[col] = self.numbers[:, j]
+        data[self.bonus_column] = self.bonus
+        return pd.DataFrame(data)
+
+# ミニロト用ペア共起行列
+class MiniLotoPairMatrix:
+    """数字ペアの共起回数を対称31×31整数行列で保持（行・列は数字1-31、対角は0）"""
+    def __init__(self, counts=None):
+        self.counts = np.zeros((31, 31), dtype=np.int64) if counts is None else counts
+    
+    @staticmethod
+    def one_hot(numbers):
+        """本数字(N, 5)を出現行列(N, 31)に変換（範囲外の値は無視）"""
+        numbers = np.asarray(numbers, dtype=np.int64).reshape(-1, 5)
+        onehot = np.zeros((len(numbers), 32), dtype=np.int32)
+        np.put_along_axis(onehot, np.clip(numbers, 0, 31), 1, axis=1)
+        return onehot[:, 1:]
+    
+    @classmethod
+    def from_numbers(cls, numbers):
+        """有効な本数字(N, 5)から外積の一括累積で作成"""
+        pair = cls()
+        pair.add_draws(numbers)
+        return pair
+    
+    @classmethod
+    def cumulative(cls, numbers, valid_mask=None):
+        """累積共起行列(N + 1, 31, 31)（区間[start, stop)の行列は cum[stop] - cum[start]）"""
+        onehot = cls.one_hot(numbers)
+        if valid_mask is not None:
+            onehot = onehot * np.asarray(valid_mask, dtype=np.int32)[:, None]
+        per_draw = onehot[:, :, None] * onehot[:, None, :]
+        idx = np.arange(31)
+        per_draw[:, idx, idx] = 0
+        cum = np.zeros((len(onehot) + 1, 31, 31), dtype=np.int32)
+        np.cumsum(per_draw, axis=0, out=cum[1:])
+        return cum
+    
+    @classmethod
+    def window(cls, cum, start, stop):
+        """累積共起行列から区間[start, stop)のペア行列を取得"""
+        return cls((cum[stop] - cum[start]).astype(np.int64))
+    
+    @classmethod
+    def from_dict(cls, pair_dict):
+        """(a, b)→回数の辞書（従来のpair_freq形式）から復元"""
+        pair = cls()
+        for (a, b), count in dict(pair_dict).items():
+            pair.counts[a - 1, b - 1] += count
+            pair.counts[b - 1, a - 1] += count
+        return pair
+    
+    def add_draws(self, numbers):
+        """有効な本数字(N, 5)をまとめて加算（O.T @ O）"""
+        onehot = self.one_hot(numbers)
+        added = onehot.T.astype(np.int64) @ onehot
+        np.fill_diagonal(added, 0)
+        self.counts += added
+        return self
+    
+    def update(self, draw):
+        """1抽選分を加算（5数字の25要素のみ更新）"""
+        idx = np.asarray(draw, dtype=np.int64) - 1
+        self.counts[idx[:, None], idx[None, :]] += 1
+        self.counts[idx, idx] -= 1
+        return self
+    
+    def count(self, a, b):
+        """ペア(a, b)の共起回数"""
+        return int(self.counts[a - 1, b - 1])
+    
+    def top_pairs(self, k=10):
+        """共起回数の多いペア上位k件（[((a, b), 回数), ...]、同数は数字順）"""
+        rows, cols = np.triu_indices(31, k=1)
+        values = self.counts[rows, cols]
+        order = np.lexsort((cols, rows, -values))[:k]
+        return [((int(rows[i]) + 1, int(cols[i]) + 1), int(values[i])) for i in order if values[i] > 0]
+    
+    def most_common(self, k=10):
+        """Counter.most_common互換の上位ペア"""
+        return self.top_pairs(k)
+    
+    def set_scores(self, number_sets):
+        """予測セット(M, 5)ごとのペア共起回数の合計（10ペア分）"""
+        idx = np.asarray(number_sets, dtype=np.int64).reshape(-1, 5) - 1
+        return self.counts[idx[:, :, None], idx[:, None, :]].sum(axis=(1, 2)) // 2
+    
+    def to_dict(self):
+        """(a, b)→回数の辞書（保存用、従来のpair_freq形式）"""
+        rows, cols = np.nonzero(np.triu(self.counts, k=1))
+        return {(int(a) + 1, int(b) + 1): int(self.counts[a, b]) for a, b in zip(rows, cols)}
+    
+    def __len__(self):
+        return int(np.count_nonzero(np.triu(self.counts, k=1)))
+
+# ミニロト用特徴量レジストリ
+class MiniLotoFeatureRegistry:
+    """特徴量を名前・型・一括計算関数・基準値で一度だけ宣言し、スキーマハッシュで版管理"""
+    def __init__(self, name):
+        self.name = name
+        self.entries = []
+    
+    def register(self, name, dtype, compute, default=0.0, version=1):
+        """1列の特徴量を登録（computeは計算文脈から(N,)配列を返す）"""
+        self.entries.append({
+            'names': [name], 'dtype': np.dtype(dtype).name, 'compute': compute,
+            'defaults': [default], 'version': version
+        })
+        return self
+    
+    def register_block(self, names, dtype, compute, version=1):
+        """複数列の特徴量ブロックを登録（computeは(N, 列数)配列を返す）"""
+        self.entries.append({
+            'names': list(names), 'dtype': np.dtype(dtype).name, 'compute': compute,
+            'defaults': [0.0] * len(names), 'version': version
+        })
+        return self
+    
+    @property
+    def names(self):
+        return [name for entry in self.entries for name in entry['names']]
+    
+    @property
+    def dimensions(self):
+        return sum(len(entry['names']) for entry in self.entries)
+    
+    def defaults(self):
+        """登録順の基準値リスト"""
+        return [value for entry in self.entries for value in entry['defaults']]
+    
+    def schema(self):
+        """計算関数を除いた宣言内容（名前・型・版）"""
+        return [{'names': entry['names'], 'dtype': entry['dtype'], 'version': entry['version']}
+                for entry in self.entries]
+    
+    def schema_hash(self):
+        """宣言内容のハッシュ（名前・型・版・順序が変われば変化）"""
+        payload = json.dumps({'registry': self.name, 'features': self.schema()}, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+    
+    def subset(self, name, columns):
+        """単一列の特徴量を列番号で選んだ部分レジストリ"""
+        entries = [entry for entry in self.entries if len(entry['names']) == 1]
+        registry = type(self)(name)
+        registry.entries = [entries[i] for i in columns]
+        return registry
+    
+    def compute(self, context):
+        """全特徴量を計算して(N, 次元数)行列に連結"""
+        columns = [
+            np.asarray(entry['compute'](context), dtype=entry['dtype']).reshape(context['rows'], -1)
+            for entry in self.entries
+        ]
+        if not columns:
+            return np.zeros((context['rows'], 0), dtype=np.float64)
+        return np.hstack(columns).astype(np.float64, copy=False)
+
+# ミニロト用特徴量エンジン（レジストリ宣言の特徴量を配列演算で一括計算）
+class MiniLotoFeatureEngine:
+    """抽選配列(N, 5)から特徴量行列を一括計算"""
+    # 14次元の形状特徴量（基準値は予測時の基準特徴量）
+    registry = (
+        MiniLotoFeatureRegistry('miniloto_shape')
+        .register('平均値', 'float64', lambda c: c['current'].mean(axis=1), 16.0)
+        .register('標準偏差', 'float64', lambda c: c['current'].std(axis=1), 6.0)
+        .register('合計値', 'float64', lambda c: c['current'].sum(axis=1), 80.0)
+        .register('奇数個数', 'float64', lambda c: (c['current'] % 2 == 1).sum(axis=1), 2.5)
+        .register('最大値', 'float64', lambda c: c['sorted'][:, 4], 28.0)
+        .register('最小値', 'float64', lambda c: c['sorted'][:, 0], 5.0)
+        .register('中央値', 'float64', lambda c: c['sorted'][:, 2], 16.0)
+        .register('範囲', 'float64', lambda c: c['sorted'][:, 4] - c['sorted'][:, 0], 23.0)
+        .register('連続数', 'float64', lambda c: (c['gaps'] == 1).sum(axis=1), 1.0)
+        .register('第1数字', 'float64', lambda c: c['current'][:, 0], 8.0)
+        .register('第3数字', 'float64', lambda c: c['current'][:, 2], 16.0)
+        .register('第5数字', 'float64', lambda c: c['current'][:, 4], 24.0)
+        .register('平均ギャップ', 'float64', lambda c: c['gaps'].mean(axis=1), 5.5)
+        .register('小数字数', 'float64', lambda c: (c['current'] <= 15).sum(axis=1), 2.5)
+    )
+    feature_names = registry.names
+    # 簡易8次元（回復用）は14次元の部分列
+    simple_columns = [0, 1, 2, 3, 4, 5, 7, 13]
+    simple_registry = registry.subset('miniloto_simple', simple_columns)
+    
+    @staticmethod
+    def _context(numbers, valid_mask=None):
+        """特徴量計算で共有する中間配列（整列・ギャップは一度だけ計算）"""
+        current = np.asarray(numbers, dtype=np.float64).reshape(-1, 5)
+        sorted_nums = np.sort(current, axis=1)
+        return {
+            'rows': len(current),
+            'numbers': numbers,
+            'valid_mask': valid_mask,
+            'current': current,
+            'sorted': sorted_nums,
+            'gaps': np.diff(sorted_nums, axis=1),  # 4個のギャップ
+        }
+    
+    @classmethod
+    def compute(cls, numbers):
+        """本数字(N, 5)から(N, 14)特徴量行列を計算"""
+        return cls.registry.compute(cls._context(numbers))
+    
+    @classmethod
+    def baseline_row(cls, overrides=None, simple=False):
+        """予測用の基準特徴量（レジストリの基準値を特徴量名で上書き）"""
+        registry = cls.simple_registry if simple else cls.registry
+        row = registry.defaults()
+        for name, value in (overrides or {}).items():
+            row[registry.names.index(name)] = float(value)
+        return row
+    
+    # 鮮度特徴量ブロック（数字別）の出現回数窓
+    recency_windows = (10, 30)
+    
+    @classmethod
+    def recency_feature_names(cls, windows=None):
+        """鮮度特徴量ブロックの特徴量名（経過回数・各窓の出現回数・各窓のzスコア × 数字1-31）"""
+        windows = cls.recency_windows if windows is None else tuple(windows)
+        kinds = ['経過回数'] + [f'出現{w}回' for w in windows] + [f'z{w}回' for w in windows]
+        return [f'{kind}_{num}' for kind in kinds for num in range(1, 32)]
+    
+    @classmethod
+    def compute_recency(cls, numbers, valid_mask=None, windows=None):
+        """数字別の鮮度ブロックを累積和でO(N·31)計算（行iは第i行までの抽選のみ使用）
+        
+        経過回数: 最後に出現してからの回数（その回に出現なら0、未出現なら行番号+1）
+        出現回数: 直近w回での出現回数（累積出現回数の差分）
+        zスコア: 直近w回の出現回数の期待値（w×5/31）からの偏差（ホット/コールド）
+        """
+        windows = cls.recency_windows if windows is None else tuple(windows)
+        onehot = MiniLotoPairMatrix.one_hot(numbers)
+        if valid_mask is not None:
+            onehot = onehot * np.asarray(valid_mask, dtype=np.int32)[:, None]
+        n = len(onehot)
+        idx = np.arange(n)
+        
+        # 最終出現行は出現行番号の累積最大
+        last_seen = np.maximum.accumulate(np.where(onehot > 0, idx[:, None], -1), axis=0)
+        gap = np.where(last_seen >= 0, idx[:, None] - last_seen, idx[:, None] + 1)
+        
+        cum = np.zeros((n + 1, 31), dtype=np.int64)
+        np.cumsum(onehot, axis=0, out=cum[1:])
+        
+        p = 5 / 31
+        counts, zscores = [], []
+        for w in windows:
+            start = np.maximum(idx + 1 - w, 0)
+            count = cum[idx + 1] - cum[start]
+            span = (idx + 1 - start)[:, None]  # 履歴が窓より短い先頭行は実際の回数
+            counts.append(count)
+            zscores.append((count - span * p) / np.sqrt(span * p * (1 - p)))
+        
+        return np.hstack([gap] + counts + zscores).astype(np.float64)
+    
+    @classmethod
+    def recency_registry(cls, windows=None):
+        """鮮度特徴量ブロックのレジストリ（窓の設定ごと）"""
+        windows = cls.recency_windows if windows is None else tuple(windows)
+        return MiniLotoFeatureRegistry('miniloto_recency').register_block(
+            cls.recency_feature_names(windows), 'float64',
+            lambda c: cls.compute_recency(c['numbers'], c['valid_mask'], windows)
+        )
+    
+    @classmethod
+    def feature_schema(cls, simple=False, include_recency=False):
+        """特徴量構成のスキーマ（次元数・特徴量名・スキーマハッシュ）"""
+        registries = [cls.simple_registry if simple else cls.registry]
+        if include_recency:
+            registries.append(cls.recency_registry())
+        return {
+            'dimensions': sum(r.dimensions for r in registries),
+            'names': [name for r in registries for name in r.names],
+            'schema_hash': hashlib.sha1('+'.join(r.schema_hash() for r in registries).encode()).hexdigest()
+        }
+    
+    @classmethod
+    def schema_for_models(cls, scalers, include_recency=False):
+        """学習済みスケーラーの入力次元から、学習時の特徴量スキーマを特定"""
+        dimensions = {getattr(scaler, 'n_features_in_', None) for scaler in scalers.values()}
+        for simple in (False, True):
+            for recency in (include_recency, not include_recency):
+                schema = cls.feature_schema(simple, recency)
+                if schema['dimensions'] in dimensions:
+                    return schema
+        return cls.feature_schema(include_recency=include_recency)
+    
+    @classmethod
+    def scale_rows(cls, scalers, row, dtype=None):
+        """予測用の特徴量行をモデルごとのスケール済み行に変換（共有スケーラーは1回だけ変換）"""
+        return cls.scale_matrix(scalers, [row], dtype)
+    
+    @staticmethod
+    def scale_matrix(scalers, rows, dtype=None):
+        """特徴量行列をモデルごとのスケール済み行列に一括変換（共有スケーラーは1回だけ変換）"""
+        transformed = {}
+        scaled = {}
+        for name, scaler in scalers.items():
+            if id(scaler) not in transformed:
+                transformed[id(scaler)] = scaler.transform(np.asarray(rows, dtype=dtype))
+            scaled[name] = transformed[id(scaler)]
+        return scaled
+    
+    @classmethod
+    def scenario_grid(cls, grid, simple=False):
+        """シナリオ（特徴量名→値リストの直積、またはシナリオ辞書のリスト）を基準特徴量行列に展開
+        
+        合計値のみ指定したシナリオは平均値を合計値/5に揃える（各予測器の基準特徴量と同じ扱い）
+        """
+        if isinstance(grid, dict):
+            names = list(grid)
+            scenarios = [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+        else:
+            scenarios = [dict(scenario) for scenario in grid]
+        rows = []
+        for scenario in scenarios:
+            overrides = dict(scenario)
+            if '合計値' in overrides and '平均値' not in overrides:
+                overrides['平均値'] = overrides['合計値'] / 5
+            rows.append(cls.baseline_row(overrides, simple))
+        return scenarios, np.asarray(rows, dtype=np.float64).reshape(len(rows), -1)
+    
+    @classmethod
+    def prediction_row(cls, base_features, data, include_recency=False):
+        """予測用の特徴量行（鮮度ブロック有効時は最新回のブロックを付加）"""
+        if not include_recency or data is None:
+            return list(base_features)
+        store = MiniLotoDrawStore.from_data(data)
+        if len(store) == 0:
+            return list(base_features)
+        return list(base_features) + cls.compute_recency(store.numbers, store.valid_mask)[-1].tolist()
+    
+    @classmethod
+    def prediction_rows(cls, base_rows, data, include_recency=False):
+        """予測用の特徴量行列（鮮度ブロック有効時は最新回のブロックを全行に付加）"""
+        base_rows = np.asarray(base_rows, dtype=np.float64)
+        if not include_recency or data is None:
+            return base_rows
+        store = MiniLotoDrawStore.from_data(data)
+        if len(store) == 0:
+            return base_rows
+        block = cls.compute_recency(store.numbers, store.valid_mask)[-1]
+        return np.hstack([base_rows, np.tile(block, (len(base_rows), 1))])
+    
+    @classmethod
+    def compute_simple(cls, numbers):
+        """本数字(N, 5)から簡易8次元特徴量行列を計算"""
+        return cls.compute(numbers)[:, cls.simple_columns]
+    
+    @staticmethod
+    def default_dtype():
+        """特徴量・確率配列の既定の型（環境変数 MINILOTO_FLOAT32=1 でfloat32）"""
+        if os.environ.get('MINILOTO_FLOAT32', '').lower() in ('1', 'true', 'yes'):
+            return 'float32'
+        return 'float64'
+    
+    @staticmethod
+    def nbytes(obj):
+        """配列（またはその辞書・リスト）が保持するバイト数"""
+        if obj is None:
+            return 0
+        if isinstance(obj, dict):
+            return sum(MiniLotoFeatureEngine.nbytes(v) for v in obj.values())
+        if isinstance(obj, (list, tuple)):
+            return sum(MiniLotoFeatureEngine.nbytes(v) for v in obj)
+        return int(getattr(obj, 'nbytes', 0))
+    
+    @classmethod
+    def memory_report(cls, stages, title="メモリ使用量"):
+        """段階別の保持バイト数を表示して{段階: バイト数}を返す"""
+        report = {name: cls.nbytes(obj) if not isinstance(obj, int) else obj for name, obj in stages.items()}
+        print(f"💾 {title}:")
+        for name, size in report.items():
+            print(f"  {name}: {size / 1024:.1f}KB")
+        print(f"  合計: {sum(report.values()) / 1024:.1f}KB")
+        return report
+    
+    @classmethod
+    def training_set(cls, data, simple=False, limit=None, target_mode='multilabel', include_recency=False,
+                     dtype=None):
+        """有効行の特徴量と次回の本数字を対応付けた学習データ
+        
+        target_mode='multilabel': 1抽選1行、ターゲットは次回出現の(N, 31)二値行列
+        target_mode='scalar': 従来互換（1行を5回複製し、ターゲットは数字1個）
+        include_recency=True: 14次元の後ろに鮮度特徴量ブロックを連結
+        dtype='float32': 特徴量行列をfloat32で返す（メモリ半減）
+        """
+        store = MiniLotoDrawStore.from_data(data)
+        n = len(store) if limit is None else min(len(store), limit)
+        
+        # 次回が存在する有効行のみ
+        rows = np.flatnonzero(store.valid_mask[:n])
+        rows = rows[rows < len(store) - 1]
+        
+        # 特徴量ストア付与済みなら行を取り出すだけ（再計算なし）
+        if store.feature_matrix is not None:
+            features = store.feature_matrix[rows]
+        else:
+            features = cls.compute(store.numbers[rows])
+        if simple:
+            features = features[:, cls.simple_columns]
+        if include_recency:
+            recency = cls.recency_registry().compute(cls._context(store.numbers, store.valid_mask))
+            features = np.hstack([features, recency[rows]])
+        if dtype is not None:
+            features = features.astype(dtype, copy=False)
+        next_numbers = store.numbers[rows + 1]
+        
+        if target_mode == 'scalar':
+            return np.repeat(features, 5, axis=0), next_numbers.reshape(-1).astype(np.int64)
+        
+        targets = np.zeros((len(rows), 31), dtype=np.uint8)
+        in_range = (next_numbers >= 1) & (next_numbers <= 31)
+        row_ids = np.broadcast_to(np.arange(len(rows))[:, None], next_numbers.shape)
+        targets[row_ids[in_range], next_numbers[in_range].astype(np.int64) - 1] = 1
+        return features, targets
+    
+    @staticmethod
+    def sample_count(X, y):
+        """従来の5行複製形式に換算したサンプル数（データ量判定用）"""
+        if X is None:
+            return 0
+        return len(X) * 5 if np.ndim(y) == 2 else len(X)
+
+# ミニロト用特徴量ストア（データ内容ハッシュでバージョン管理、新規回のみ追加計算）
+class MiniLotoFeatureStore:
+    """開催回ごとに1行の14次元特徴量をディスクに保持し、抽選データの追記分だけ計算"""
+    def __init__(self, store_dir="miniloto_models/data_cache", dtype=None):
+        self.store_dir = store_dir
+        self.store_file = os.path.join(store_dir, "draw_features.pkl")
+        self.dtype = np.dtype(dtype or MiniLotoFeatureEngine.default_dtype())
+        self.rounds = None
+        self.features = None
+        self.version = None
+        self.last_update = None  # 'memory' / 'disk' / 'incremental' / 'full'
+        self._loaded = False
+    
+    @staticmethod
+    def data_version(numbers, rounds):
+        """抽選配列の内容ハッシュ（開催回と本数字のバイト列）"""
+        digest = hashlib.sha1()
+        digest.update(np.ascontiguousarray(rounds, dtype=np.int32).tobytes())
+        digest.update(np.ascontiguousarray(numbers, dtype=np.uint8).tobytes())
+        return digest.hexdigest()
+    
+    def features_for(self, draw_store):
+        """ストア全行の特徴量(N, 14)を返す（既知の回は再計算しない）"""
+        from_disk = False if self._loaded else self._load()
+        
+        version = self.data_version(draw_store.numbers, draw_store.rounds)
+        if self.features is not None and version == self.version:
+            self.last_update = 'disk' if from_disk else 'memory'
+            return self.features
+        
+        cached = 0 if self.rounds is None else len(self.rounds)
+        if (0 < cached <= len(draw_store) and
+                self.data_version(draw_store.numbers[:cached], draw_store.rounds[:cached]) == self.version):
+            # 既存部分は同一 → 追加された回のみ計算
+            new_rows = MiniLotoFeatureEngine.compute(draw_store.numbers[cached:]).astype(self.dtype, copy=False)
+            self.features = np.concatenate([self.features, new_rows])
+            self.last_update = 'incremental'
+            print(f"➕ 特徴量ストア差分計算: 新規{len(new_rows)}回")
+        else:
+            self.features = MiniLotoFeatureEngine.compute(draw_store.numbers).astype(self.dtype, copy=False)
+            self.last_update = 'full'
+            print(f"🔧 特徴量ストア全件計算: {len(self.features)}回")
+        
+        self.rounds = np.array(draw_store.rounds, dtype=np.int32)
+        self.version = version
+        self._save()
+        return self.features
+    
+    def attach(self, draw_store):
+        """特徴量をストアに付与（以降のスライス・学習は再計算なし）"""
+        try:
+            draw_store.feature_matrix = self.features_for(draw_store)
+        except Exception as e:
+            print(f"⚠️ 特徴量ストア付与失敗: {e}")
+        return draw_store
+    
+    def _load(self):
+        """ディスクから読み込み（特徴量定義が変わっていれば破棄）"""
+        self._loaded = True
+        try:
+            if not os.path.exists(self.store_file):
+                return False
+            with open(self.store_file, 'rb') as f:
+                saved = pickle.load(f)
+            if saved.get('schema_hash') != MiniLotoFeatureEngine.registry.schema_hash():
+                print("🔄 特徴量スキーマ変更: 特徴量ストアを再計算します")
+                return False
+            if np.dtype(saved.get('dtype', 'float64')) != self.dtype:
+                print(f"🔄 特徴量の型変更（{self.dtype.name}）: 特徴量ストアを再計算します")
+                return False
+            self.rounds = saved['rounds']
+            self.features = saved['features']
+            self.version = saved['version']
+            return True
+        except Exception as e:
+            print(f"⚠️ 特徴量ストア読み込み失敗: {e}")
+            return False
+    
+    def _save(self):
+        """一時ファイル経由で保存"""
+        try:
+            os.makedirs(self.store_dir, exist_ok=True)
+            tmp_file = self.store_file + '.tmp'
+            with open(tmp_file, 'wb') as f:
+                pickle.dump({
+                    'rounds': self.rounds,
+                    'features': self.features,
+                    'version': self.version,
+                    'schema_hash': MiniLotoFeatureEngine.registry.schema_hash(),
+                    'feature_names': MiniLotoFeatureEngine.feature_names,
+                    'dtype': self.dtype.name
+                }, f)
+            os.replace(tmp_file, self.store_file)
+            return True
+        except Exception as e:
+            print(f"⚠️ 特徴量ストア保存失敗: {e}")
+            return False
+    
+    def clear(self):
+        """メモリ・ディスクの特徴量を破棄"""
+        if os.path.exists(self.store_file):
+            os.remove(self.store_file)
+        self.rounds = None
+        self.features = None
+        self.version = None
+        self.last_update = None
+
+# ミニロト用数字別確率モデル（(N, 31)ターゲット対応）
+class MiniLotoNumberProbabilityModel(BaseEstimator):
+    """次回出現(N, 31)ターゲットを学習し、1-31の数字別確率を返す学習器ラッパー"""
+    # 早期終了の検証分割に必要な少数クラスの最小件数（未満の数字は早期終了なしで学習）
+    min_early_stopping_count = 10
+    
+    def __init__(self, estimator=None):
+        self.estimator = estimator
+    
+    @classmethod
+    def for_targets(cls, model, y):
+        """ターゲット形状に応じた学習器（(N, 31)なら数字別確率モデルで包む）"""
+        return cls(model) if np.ndim(y) == 2 else model
+    
+    def fit(self, X, Y, deadline=None):
+        """学習（deadline指定時は期限で打ち切り、途中までの状態を保持してcompleted_=False）"""
+        Y = np.asarray(Y)
+        self.classes_ = np.arange(1, 32)
+        self.base_rates_ = Y.mean(axis=0)
+        self.n_samples_ = len(Y)
+        
+        if isinstance(self.estimator, (RandomForestClassifier, MLPClassifier)):
+            # 多出力をネイティブに扱える学習器は一度で学習
+            self.native_ = True
+            model, self.completed_ = self.fit_within(clone(self.estimator), X, Y, deadline)
+            self.estimators_ = [model]
+        else:
+            # 数字ごとの二値分類（片方のクラスしかない数字・期限切れで未学習の数字は出現率を定数として使用）
+            self.native_ = False
+            self.completed_ = True
+            self.estimators_ = []
+            for j in range(Y.shape[1]):
+                if not 0 < Y[:, j].sum() < len(Y):
+                    self.estimators_.append(None)
+                elif deadline is not None and time.time() >= deadline:
+                    self.completed_ = False
+                    self.estimators_.append(None)
+                else:
+                    try:
+                        model, completed = self.fit_within(self.column_estimator(Y[:, j]), X, Y[:, j], deadline)
+                    except ValueError as e:
+                        print(f"⚠️ 数字{j + 1}: 学習エラー {e}（出現率を使用）")
+                        model, completed = None, True
+                    self.completed_ &= completed
+                    self.estimators_.append(model)
+        return self
+    
+    def column_estimator(self, y):
+        """1数字分の推定器（少数クラスが少ない数字は層化した検証分割ができないため早期終了を無効化）"""
+        estimator = clone(self.estimator)
+        params = estimator.get_params()
+        if params.get('early_stopping') not in (None, False):
+            minority = min(int(np.sum(y)), len(y) - int(np.sum(y)))
+            if minority < self.min_early_stopping_count:
+                estimator.set_params(early_stopping=False)
+        return estimator
+    
+    @staticmethod
+    def fit_within(estimator, X, y, deadline=None, stages=10):
+        """期限付き学習（木の数・反復数をstages段階に分けて追加し、期限を過ぎたらその時点で終了）
+        
+        戻り値: (学習済み推定器, 最後まで学習できたか)
+        """
+        if deadline is None:
+            return estimator.fit(X, y), True
+        size_param = 'max_iter' if isinstance(estimator, (HistGradientBoostingClassifier, MLPClassifier)) else 'n_estimators'
+        params = estimator.get_params()
+        if size_param not in params or 'warm_start' not in params:
+            return estimator.fit(X, y), time.time() < deadline
+        
+        target = params[size_param]
+        chunk = max(1, target // stages)
+        done = 0
+        completed = True
+        estimator.set_params(warm_start=True)
+        while done < target:
+            step = min(chunk, target - done)
+            if isinstance(estimator, MLPClassifier):
+                # MLPは追加学習ごとにmax_iterエポックを実行
+                before = getattr(estimator, 'n_iter_', 0)
+                estimator.set_params(max_iter=step)
+                estimator.fit(X, y)
+                done += step
+                if estimator.n_iter_ - before < step:
+                    break  # 収束
+            else:
+                done += step
+                estimator.set_params(**{size_param: done})
+                estimator.fit(X, y)
+                if getattr(estimator, 'n_iter_', done) < done:
+                    break  # HistGBの早期終了
+            if done < target and time.time() >= deadline:
+                completed = False
+                break
+        
+        estimator.set_params(warm_start=False, **{size_param: target if completed else done})
+        return estimator, completed
+    
+    @staticmethod
+    def warm_update(estimator, X, y, extra_estimators=10, epochs=5):
+        """学習済み推定器の追加学習（RF: 木を追加、GB: ブースティング継続、MLP: partial_fitのエポック）"""
+        if isinstance(estimator, MLPClassifier):
+            for _ in range(epochs):
+                estimator.partial_fit(X, y)
+            return estimator
+        # 木の数のパラメータ（HistGBはmax_iter）
+        size_param = 'max_iter' if isinstance(estimator, HistGradientBoostingClassifier) else 'n_estimators'
+        if size_param not in estimator.get_params():
+            raise ValueError(f"追加学習非対応のモデル: {type(estimator).__name__}")
+        
+        # 追加分の木は新規データのクラス構成で学習されるため、学習時と同じ構成が必要
+        if np.ndim(y) == 2:
+            if not ((y.min(axis=0) == 0) & (y.max(axis=0) == 1)).all():
+                raise ValueError("追加学習データに片方のクラスしかない数字があります")
+        elif not np.array_equal(np.unique(y), estimator.classes_):
+            raise ValueError("追加学習データのクラス構成が学習時と異なります")
+        
+        estimator.set_params(warm_start=True, **{size_param: estimator.get_params()[size_param] + extra_estimators})
+        estimator.fit(X, y)
+        return estimator
+    
+    def partial_update(self, X, Y, new_rows=None, extra_estimators=10, epochs=5):
+        """直近データで追加学習（出現率は新規行new_rows件分を累積に加算）"""
+        Y = np.asarray(Y)
+        new_rows = len(Y) if new_rows is None else min(new_rows, len(Y))
+        n_old = getattr(self, 'n_samples_', None)
+        if n_old is not None and new_rows > 0:
+            added = Y[len(Y) - new_rows:]
+            self.base_rates_ = (self.base_rates_ * n_old + added.sum(axis=0)) / (n_old + new_rows)
+            self.n_samples_ = n_old + new_rows
+        
+        if self.native_:
+            self.warm_update(self.estimators_[0], X, Y, extra_estimators, epochs)
+        else:
+            # 片方のクラスしかない数字は既存のモデル（または出現率）のまま
+            for j, model in enumerate(self.estimators_):
+                if model is not None and 0 < Y[:, j].sum() < len(Y):
+                    self.warm_update(model, X, Y[:, j], extra_estimators, epochs)
+        return self
+    
+    def predict_number_proba(self, X):
+        """数字別の次回出現確率(n, 31)（行和はおおよそ5）"""
+        X = np.asarray(X)
+        # float32入力なら確率もfloat32（それ以外はfloat64）
+        dtype = np.float32 if X.dtype == np.float32 else np.float64
+        proba = np.tile(self.base_rates_.astype(dtype), (len(X), 1))
+        
+        if self.native_:
+            model = self.estimators_[0]
+            out = model.predict_proba(X)
+            if isinstance(out, list):
+                # ランダムフォレスト: 数字ごとの(n, クラス数)
+                for j, (p, classes) in enumerate(zip(out, model.classes_)):
+                    hit = np.flatnonzero(classes == 1)
+                    proba[:, j] = p[:, hit[0]] if len(hit) else 0.0
+            else:
+                proba = np.asarray(out, dtype=dtype)
+        else:
+            for j, model in enumerate(self.estimators_):
+                if model is not None:
+                    proba[:, j] = model.predict_proba(X)[:, 1]
+        return proba
+    
+    def predict_proba(self, X):
+        """従来の多クラス形式と同じく行和1に正規化した確率(n, 31)"""
+        proba = self.predict_number_proba(X)
+        total = proba.sum(axis=1, keepdims=True)
+        return np.divide(proba, total, out=np.full_like(proba, 1 / 31), where=total > 0)
+    
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_number_proba(X), axis=1)]
+    
+    def score(self, X, Y):
+        """上位5数字の的中率（次回本数字5個のうち一致した割合の平均）"""
+        top5 = np.argpartition(-self.predict_number_proba(X), 5, axis=1)[:, :5]
+        return float(np.take_along_axis(np.asarray(Y), top5, axis=1).sum(axis=1).mean() / 5)
+    
+    @staticmethod
+    def number_probabilities(model, X):
+        """学習済みモデルから数字別確率(n, 31)を取得（従来の単一ターゲットモデルにも対応）"""
+        if hasattr(model, 'predict_number_proba'):
+            return model.predict_number_proba(X)
+        proba = model.predict_proba(X)
+        out = np.zeros((len(proba), 31), dtype=proba.dtype)
+        classes = np.asarray(model.classes_).astype(np.int64)
+        in_range = (classes >= 1) & (classes <= 31)
+        out[:, classes[in_range] - 1] = proba[:, in_range]
+        return out
+
+# 時系列CVのフォールドモデルを平均する最終モデル（全行での再学習を省略する場合）
+class MiniLotoFoldEnsemble(BaseEstimator):
+    """フォールドごとの学習済みモデルの数字別確率を平均"""
+    classes_ = np.arange(1, 32)
+    
+    def __init__(self, models=None):
+        self.models = models
+    
+    def predict_number_proba(self, X):
+        return np.mean([MiniLotoNumberProbabilityModel.number_probabilities(m, X) for m in self.models], axis=0)
+    
+    def predict_proba(self, X):
+        proba = self.predict_number_proba(X)
+        total = proba.sum(axis=1, keepdims=True)
+        return np.divide(proba, total, out=np.full_like(proba, 1 / 31), where=total > 0)
+    
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_number_proba(X), axis=1)]
+    
+    def score(self, X, Y):
+        """上位5数字の的中率"""
+        top5 = np.argpartition(-self.predict_number_proba(X), 5, axis=1)[:, :5]
+        return float(np.take_along_axis(np.asarray(Y), top5, axis=1).sum(axis=1).mean() / 5)
+    
+    def partial_update(self, X, Y, new_rows=None, extra_estimators=10, epochs=5):
+        """各フォールドモデルを追加学習"""
+        for model in self.models:
+            if hasattr(model, 'partial_update'):
+                model.partial_update(X, Y, new_rows, extra_estimators, epochs)
+            else:
+                MiniLotoNumberProbabilityModel.warm_update(model, X, Y, extra_estimators, epochs)
+        return self
+
+# アンサンブル各枠の推定器（GB枠のバックエンドを切替可能）
+class MiniLotoEstimatorFactory:
+    """推定器の生成とメタデータ用の構成記録（GB枠は環境変数 MINILOTO_GB_BACKEND でも指定可）"""
+    gradient_boost_backends = ('sklearn', 'hist')
+    
+    @classmethod
+    def gradient_boost_backend(cls, backend=None):
+        backend = (backend or os.environ.get('MINILOTO_GB_BACKEND') or 'sklearn').lower()
+        if backend not in cls.gradient_boost_backends:
+            print(f"⚠️ 未対応のGBバックエンド: {backend}（sklearnを使用）")
+            backend = 'sklearn'
+        return backend
+    
+    @classmethod
+    def gradient_boost(cls, n_estimators=80, max_depth=6, random_state=42, backend=None):
+        """GB枠の推定器（'hist': ビン化・マルチスレッド・早期終了のHistGradientBoostingClassifier）"""
+        if cls.gradient_boost_backend(backend) == 'hist':
+            return HistGradientBoostingClassifier(
+                max_iter=n_estimators, max_depth=max_depth, early_stopping=True,
+                validation_fraction=0.1, n_iter_no_change=10, random_state=random_state
+            )
+        return GradientBoostingClassifier(
+            n_estimators=n_estimators, max_depth=max_depth, random_state=random_state
+        )
+    
+    @staticmethod
+    def describe(models):
+        """{モデル名: 推定器クラス名}（数字別確率モデルは中の推定器）"""
+        return {
+            name: MiniLotoEstimatorFactory._estimator_name(model) for name, model in models.items()
+        }
+    
+    @staticmethod
+    def _estimator_name(model):
+        if isinstance(model, MiniLotoFoldEnsemble):
+            return MiniLotoEstimatorFactory._estimator_name(model.models[0]) if model.models else 'MiniLotoFoldEnsemble'
+        if isinstance(model, MiniLotoNumberProbabilityModel):
+            return type(model.estimator).__name__
+        return type(model).__name__
+    
+    @staticmethod
+    def is_threaded(model):
+        """内部でマルチスレッド学習する推定器か（n_jobs指定またはOpenMP）"""
+        return 'n_jobs' in model.get_params() or isinstance(model, HistGradientBoostingClassifier)
+
+# アンサンブル構成モデルの学習（プロセスプールのワーカーでも呼ばれるためモジュール関数）
+def _fit_ensemble_member(task):
+    """1モデルを学習して(学習済みモデル, スコア, エラー, 検証区間の数字別確率, 状態)を返す
+    
+    task['train'] / task['test']: 学習・検証の行範囲(start, stop)（Noneなら全行で学習のみ）
+    task['member_budget'] / task['run_deadline']: モデルごとの秒数・実行全体の期限（time.time()基準）
+    状態: {'status': 'complete' / 'partial' / 'dropped', 'seconds': 学習時間}
+    """
+    started = time.time()
+    deadline = None
+    if task.get('member_budget'):
+        deadline = started + task['member_budget']
+    if task.get('run_deadline'):
+        deadline = task['run_deadline'] if deadline is None else min(deadline, task['run_deadline'])
+    if deadline is not None and started >= deadline:
+        return None, None, "時間予算切れ（未実行）", None, {'status': 'dropped', 'seconds': 0.0}
+    
+    shms = []
+    try:
+        arrays = []
+        for spec in (task['X'], task['y']):
+            if isinstance(spec, np.ndarray):
+                arrays.append(spec)
+            else:
+                # 共有メモリ上の行列をコピーせずに参照
+                shm = shared_memory.SharedMemory(name=spec['name'])
+                shms.append(shm)
+                arrays.append(np.ndarray(spec['shape'], dtype=spec['dtype'], buffer=shm.buf))
+        X, y = arrays
+        
+        train = slice(*task['train']) if task['train'] else slice(None)
+        
+        from threadpoolctl import threadpool_limits
+        with threadpool_limits(limits=task['threads']):
+            model = MiniLotoNumberProbabilityModel.for_targets(task['model'], y)
+            if isinstance(model, MiniLotoNumberProbabilityModel):
+                model.fit(X[train], y[train], deadline=deadline)
+                completed = model.completed_
+            else:
+                model, completed = MiniLotoNumberProbabilityModel.fit_within(model, X[train], y[train], deadline)
+            score, proba = None, None
+            if task['test']:
+                # 学習区間より後の行で評価（時系列順）
+                test = slice(*task['test'])
+                score = float(model.score(X[test], y[test]))
+                proba = MiniLotoNumberProbabilityModel.number_probabilities(model, X[test])
+        status = {'status': 'complete' if completed else 'partial', 'seconds': time.time() - started}
+        return model, score, None, proba, status
+    except Exception as e:
+        return None, None, str(e), None, {'status': 'dropped', 'seconds': time.time() - started}
+    finally:
+        for shm in shms:
+            shm.close()
+
+def _ensemble_worker(task_queue, result_queue):
+    """学習ワーカープロセス（(番号, タスク)を順に学習し、開始・結果を通知、Noneで終了）"""
+    while True:
+        item = task_queue.get()
+        if item is None:
+            break
+        index, task = item
+        result_queue.put(('start', index, os.getpid(), time.time()))
+        result_queue.put(('done', index, os.getpid(), _fit_ensemble_member(task)))
+
+# アンサンブル並列学習（特徴量行列は共有メモリで1回だけ受け渡し）
+class MiniLotoParallelTrainer:
+    """構成モデルをプロセスプールで同時に学習し、コア予算内でスレッド数を配分"""
+    def __init__(self, core_budget=None, max_workers=None, member_budget=None, run_budget=None):
+        # コア予算（未指定なら環境変数 MINILOTO_CORES → CPU数）
+        if core_budget is None:
+            core_budget = int(os.environ.get('MINILOTO_CORES', 0)) or os.cpu_count() or 1
+        self.core_budget = max(1, int(core_budget))
+        self.max_workers = max_workers
+        # 時間予算（秒、未指定なら環境変数 MINILOTO_MEMBER_BUDGET / MINILOTO_RUN_BUDGET、0は無制限）
+        if member_budget is None:
+            member_budget = float(os.environ.get('MINILOTO_MEMBER_BUDGET', 0))
+        if run_budget is None:
+            run_budget = float(os.environ.get('MINILOTO_RUN_BUDGET', 0))
+        self.member_budget = member_budget or None  # 1タスク（1モデル・1フォールド）あたり
+        self.run_budget = run_budget or None        # fit()1回あたり
+        self.last_report = {}  # {モデル名: {'status', 'seconds', 'reason'}}
+    
+    def plan(self, models, tasks_per_model=1):
+        """(ワーカー数, {モデル名: スレッド数})（n_jobs対応モデルに残りのコアを配分）"""
+        task_count = len(models) * tasks_per_model
+        workers = min(task_count, self.core_budget, self.max_workers or task_count)
+        workers = max(1, workers)
+        threaded = [name for name, model in models.items() if MiniLotoEstimatorFactory.is_threaded(model)]
+        single = (len(models) - len(threaded)) * tasks_per_model
+        if workers == 1:
+            return 1, {name: self.core_budget for name in models}
+        spare = max(1, self.core_budget - min(single, workers))
+        threads = {name: 1 for name in models}
+        for name in threaded:
+            threads[name] = max(1, spare // max(1, len(threaded) * tasks_per_model))
+        return workers, threads
+    
+    @staticmethod
+    def _share(array, shms):
+        """配列を共有メモリに1回だけコピーし、ワーカーに渡す参照情報を返す"""
+        array = np.ascontiguousarray(array)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+        shms.append(shm)
+        np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+        return {'name': shm.name, 'shape': array.shape, 'dtype': array.dtype.str}
+    
+    grace_seconds = 5.0  # タスク・実行全体の期限を過ぎてから応答を待つ秒数
+    poll_seconds = 1.0   # ワーカーの応答・生存を確認する間隔
+    
+    @staticmethod
+    def time_folds(n_rows, cv):
+        """時系列順の分割[(学習範囲, 検証範囲), ...]（学習は常に検証より前の行）"""
+        if not cv or n_rows <= cv:
+            return []
+        return [((0, int(train[-1]) + 1), (int(test[0]), int(test[-1]) + 1))
+                for train, test in TimeSeriesSplit(n_splits=cv).split(np.empty((n_rows, 1)))]
+    
+    def fit(self, models, X, y, cv=None, refit=True):
+        """全モデルを学習して{モデル名: (最終モデル, 時系列CVスコア, エラー)}を返す
+        
+        cv: 時系列分割数（フォールドの学習・検証も並列タスク、検証区間の確率はself.last_oofに保持）
+        refit=False: 全行での再学習を省略し、フォールドモデルの平均を最終モデルにする
+        時間予算を超えたモデルは終了したタスク（全行・フォールド）だけで組み立て、1つも終わらなければ
+        エラー（理由）として除外（self.last_reportに記録、CVスコアが得られなければNone）
+        """
+        run_deadline = time.time() + self.run_budget if self.run_budget else None
+        folds = self.time_folds(len(X), cv)
+        refit = refit or not folds
+        # モデルごとのタスクを1巡ずつ交互に並べ、全モデルの最初のタスク（全行学習または最初のフォールド）を先に実行
+        member_jobs = [([(name, None)] if refit else []) + [(name, k) for k in range(len(folds))] for name in models]
+        jobs = [job for round_jobs in itertools.zip_longest(*member_jobs) for job in round_jobs if job is not None]
+        
+        workers, threads = self.plan(models, len(jobs) // max(1, len(models)))
+        tasks = []
+        for name, k in jobs:
+            model = clone(models[name])
+            if 'n_jobs' in model.get_params():
+                model.set_params(n_jobs=threads[name])
+            train, test = folds[k] if k is not None else (None, None)
+            tasks.append({'model': model, 'X': X, 'y': y, 'train': train, 'test': test, 'threads': threads[name],
+                          'member_budget': self.member_budget, 'run_deadline': run_deadline})
+        
+        outputs = self._run(tasks, X, y, workers, run_deadline)
+        
+        results = {}
+        self.last_oof = {}
+        self.last_report = {}
+        for name in models:
+            member_outputs = [(k, out) for (job_name, k), out in zip(jobs, outputs) if job_name == name]
+            errors = [out[2] for _, out in member_outputs if out[2] is not None]
+            # 終了したタスクのみ使用（全行学習・フォールドの一部が打ち切られても残りでモデルを組み立てる）
+            full = [out for k, out in member_outputs if k is None and out[2] is None]
+            fold = sorted([(folds[k], out) for k, out in member_outputs if k is not None and out[2] is None],
+                          key=lambda item: item[0][1][0])
+            finished = full + [out for _, out in fold]
+            partial = errors or any(out[4]['status'] == 'partial' for out in finished)
+            self.last_report[name] = {
+                'status': 'dropped' if not finished else 'partial' if partial else 'complete',
+                'seconds': float(sum(out[4]['seconds'] for _, out in member_outputs)),
+                'reason': errors[0] if errors else '時間予算で打ち切り' if partial else None,
+            }
+            if not finished:
+                results[name] = (None, None, errors[0] if errors else "学習タスクなし")
+                continue
+            
+            score = float(np.mean([out[1] for _, out in fold])) if fold else None
+            if fold:
+                # 検証区間の数字別確率（最初の学習区間・未終了のフォールドはNaN）
+                oof = np.full((len(X), 31), np.nan, dtype=X.dtype if X.dtype.kind == 'f' else np.float64)
+                for (_, (test_start, test_stop)), out in fold:
+                    oof[test_start:test_stop] = out[3]
+                self.last_oof[name] = oof
+            final = full[0][0] if full else MiniLotoFoldEnsemble([out[0] for _, out in fold])
+            results[name] = (final, score, None)
+        return results
+    
+    def _run(self, tasks, X, y, workers, run_deadline=None):
+        """タスクをワーカープロセスで実行（1ワーカーまたは失敗時は逐次）"""
+        if workers > 1:
+            shms = []
+            try:
+                X_ref, y_ref = self._share(X, shms), self._share(y, shms)
+                for task in tasks:
+                    task['X'], task['y'] = X_ref, y_ref
+                return self._run_workers(tasks, workers, run_deadline)
+            except Exception as e:
+                print(f"⚠️ 並列学習失敗、逐次学習に切替: {e}")
+                for task in tasks:
+                    task['X'], task['y'] = X, y
+            finally:
+                for shm in shms:
+                    shm.close()
+                    shm.unlink()
+        
+        return [_fit_ensemble_member(task) for task in tasks]
+    
+    def _task_limit(self, started, run_deadline):
+        """開始時刻から見たタスクの応答期限（モデル別予算・実行全体の期限＋猶予、どちらもなければNone）"""
+        limits = []
+        if self.member_budget:
+            limits.append(started + self.member_budget + self.grace_seconds)
+        if run_deadline is not None:
+            limits.append(run_deadline + self.grace_seconds)
+        return min(limits) if limits else None
+    
+    def _run_workers(self, tasks, workers, run_deadline=None):
+        """自前のワーカープロセスで実行（期限内に応答しないタスクのワーカーは終了して補充）"""
+        context = multiprocessing.get_context()
+        task_queue, result_queue = context.Queue(), context.Queue()
+        processes = {}  # {pid: Process}
+        
+        def start_worker():
+            process = context.Process(target=_ensemble_worker, args=(task_queue, result_queue))
+            process.start()
+            processes[process.pid] = process
+        
+        def stop(process):
+            if process.is_alive():
+                process.terminate()
+                process.join(timeout=self.grace_seconds)
+            if process.is_alive():
+                process.kill()
+                process.join()
+        
+        stalled = (None, None, "時間予算超過（応答なし）", None, {'status': 'dropped', 'seconds': 0.0})
+        outputs = [None] * len(tasks)
+        running = {}  # {タスク番号: (pid, 開始時刻)}
+        try:
+            for index, task in enumerate(tasks):
+                task_queue.put((index, task))
+            for _ in range(workers):
+                task_queue.put(None)
+                start_worker()
+            
+            remaining = len(tasks)
+            while remaining:
+                # 終了済みのワーカーは送信済みの結果を読み切ってから異常終了と判定
+                exited = {pid for pid, process in processes.items() if not process.is_alive()}
+                try:
+                    kind, index, pid, value = result_queue.get(timeout=self.poll_seconds)
+                    exited = set()
+                    if kind == 'start':
+                        running[index] = (pid, value)
+                    elif outputs[index] is None:
+                        running.pop(index, None)
+                        outputs[index] = value
+                        remaining -= 1
+                except queue.Empty:
+                    pass
+                
+                now = time.time()
+                for index, (pid, started) in list(running.items()):
+                    limit = self._task_limit(started, run_deadline)
+                    if pid in exited or (limit is not None and now >= limit):
+                        # 期限付き学習でも終わらないタスク（1段階が長すぎる等）・異常終了したワーカーは
+                        # ワーカーごと終了し、残りのタスク用に補充
+                        del running[index]
+                        outputs[index] = stalled if pid not in exited else (
+                            None, None, "学習ワーカー異常終了", None, {'status': 'dropped', 'seconds': now - started})
+                        remaining -= 1
+                        stop(processes.pop(pid))
+                        task_queue.put(None)
+                        start_worker()
+                if remaining and not any(process.is_alive() for process in processes.values()):
+                    raise RuntimeError("学習ワーカーが応答なく終了しました")
+                if remaining and run_deadline is not None and now >= run_deadline + self.grace_seconds and not running:
+                    # 期限後に開始されないタスクは未実行として扱う
+                    break
+            return [out if out is not None else stalled for out in outputs]
+        finally:
+            for process in processes.values():
+                process.join(timeout=self.grace_seconds)
+                stop(process)
+            task_queue.cancel_join_thread()
+            task_queue.close()
+            result_queue.close()
+
+# 新規回のみの追加学習（学習状態はチェックポイントで次回セッションへ引継ぎ）
+class MiniLotoIncrementalTrainer:
+    """学習済みモデルを新規回のデータで追加学習し、一定回数ごとに全件再学習"""
+    def __init__(self, name, checkpoint_dir="miniloto_models/models", full_retrain_every=12,
+                 min_batch=100, extra_estimators=10, partial_epochs=5):
+        self.name = name
+        self.checkpoint_file = os.path.join(checkpoint_dir, f"{name}_incremental.pkl")
+        self.full_retrain_every = full_retrain_every  # 追加学習この回数ごとに全件再学習
+        self.min_batch = min_batch                    # 追加学習に使う直近行数の下限
+        self.extra_estimators = extra_estimators      # RF・GBに追加する木の数
+        self.partial_epochs = partial_epochs          # MLPのpartial_fit回数
+        self.state = None        # 学習済みの抽選数・データ版・サンプル数・追加学習回数
+        self.last_action = None  # 'reuse' / 'incremental' / 'full'
+    
+    @staticmethod
+    def config(predictor):
+        """追加学習が可能な条件（特徴量構成・ターゲット形式・型が学習時と同じ）"""
+        return {
+            'schema_hash': MiniLotoFeatureEngine.feature_schema(
+                include_recency=predictor.include_recency)['schema_hash'],
+            'target_mode': predictor.target_mode,
+            'feature_dtype': predictor.feature_dtype,
+            'estimators': MiniLotoEstimatorFactory.describe(predictor.models),
+        }
+    
+    def plan(self, predictor, store):
+        """実行する学習の種類を判定"""
+        state = self.state
+        if state is None or not predictor.trained_models or state['config'] != self.config(predictor):
+            return 'full'
+        
+        draw_count = state['draw_count']
+        if (draw_count > len(store) or
+                MiniLotoFeatureStore.data_version(store.numbers[:draw_count], store.rounds[:draw_count]) != state['data_version']):
+            return 'full'  # 既存部分が変わった（訂正・再取得）
+        if draw_count == len(store):
+            return 'reuse'
+        if state['updates_since_full'] >= self.full_retrain_every:
+            return 'full'
+        return 'incremental'
+    
+    def ensure(self, predictor, data, full_train, force_full=False):
+        """学習済みモデルを最新データに追従（再利用 → 追加学習 → 全件再学習の順に試行）"""
+        store = MiniLotoDrawStore.from_data(data)
+        try:
+            if not predictor.trained_models:
+                self.restore(predictor)
+            action = 'full' if force_full else self.plan(predictor, store)
+            
+            if action == 'reuse':
+                print(f"✅ 学習済みモデルを使用（第{int(store.rounds[-1])}回まで学習済み）")
+                self.last_action = 'reuse'
+                return True
+            if action == 'incremental':
+                self.update(predictor, store)
+                self.last_action = 'incremental'
+                return True
+        except Exception as e:
+            print(f"⚠️ 追加学習失敗、全件再学習します: {e}")
+        
+        # 全件学習は分析統計を加算で作るため、前回分を空にしてから実行
+        predictor.freq_counter.clear()
+        predictor.pair_freq.counts[...] = 0
+        if not full_train(store):
+            return False
+        X, y = self._training_set(predictor, store)
+        self.state = {
+            'config': self.config(predictor),
+            'draw_count': len(store),
+            'data_version': MiniLotoFeatureStore.data_version(store.numbers, store.rounds),
+            'sample_count': len(X),
+            'updates_since_full': 0,
+        }
+        self.last_action = 'full'
+        self.save(predictor)
+        return True
+    
+    @staticmethod
+    def _training_set(predictor, store):
+        return MiniLotoFeatureEngine.training_set(
+            store, target_mode=predictor.target_mode, include_recency=predictor.include_recency,
+            dtype=predictor.feature_dtype
+        )
+    
+    def update(self, predictor, store):
+        """新規回のサンプル（下限min_batch行まで直近で補完）で全モデルを追加学習"""
+        state = self.state
+        X, y = self._training_set(predictor, store)
+        new_samples = len(X) - state['sample_count']
+        
+        if new_samples > 0:
+            batch = min(len(X), max(new_samples, self.min_batch))
+            X_batch, y_batch = X[-batch:], y[-batch:]
+            
+            # スケーラーは学習時のものを固定（既存の木と同じ入力空間）
+            scaled = {}
+            for name, model in predictor.trained_models.items():
+                scaler = predictor.scalers[name]
+                if id(scaler) not in scaled:
+                    scaled[id(scaler)] = scaler.transform(X_batch)
+                if hasattr(model, 'partial_update'):
+                    model.partial_update(scaled[id(scaler)], y_batch, new_samples,
+                                         self.extra_estimators, self.partial_epochs)
+                else:
+                    MiniLotoNumberProbabilityModel.warm_update(
+                        model, scaled[id(scaler)], y_batch, self.extra_estimators, self.partial_epochs)
+        
+        # 分析統計は新規回分だけ加算
+        new_draws = store.rows(state['draw_count'], len(store))
+        predictor.freq_counter.update(new_draws.number_counts())
+        predictor.pair_freq.add_draws(new_draws.clean_numbers)
+        sum_stats = store.sum_stats()
+        if sum_stats is not None:
+            predictor.pattern_stats = {
+                'avg_sum': sum_stats[0],
+                'std_sum': sum_stats[1],
+                'most_frequent_pairs': predictor.pair_freq.most_common(10)
+            }
+        predictor.data_count = len(store)
+        
+        state.update({
+            'draw_count': len(store),
+            'data_version': MiniLotoFeatureStore.data_version(store.numbers, store.rounds),
+            'sample_count': len(X),
+            'updates_since_full': state['updates_since_full'] + 1,
+        })
+        remaining = max(0, self.full_retrain_every - state['updates_since_full'])
+        print(f"➕ 追加学習完了: 新規{len(new_draws)}回（全件再学習まで残り{remaining}回）")
+        self.save(predictor)
+    
+    def save(self, predictor):
+        """モデル・分析統計・学習状態をチェックポイントに保存"""
+        try:
+            os.makedirs(os.path.dirname(self.checkpoint_file), exist_ok=True)
+            tmp_file = self.checkpoint_file + '.tmp'
+            with open(tmp_file, 'wb') as f:
+                pickle.dump({
+                    'state': self.state,
+                    'trained_models': dict(predictor.trained_models),
+                    'scalers': dict(predictor.scalers),
+                    'model_scores': dict(predictor.model_scores),
+                    'freq_counter': dict(predictor.freq_counter),
+                    'pair_counts': predictor.pair_freq.counts,
+                    'pattern_stats': predictor.pattern_stats,
+                    'data_count': predictor.data_count,
+                }, f)
+            os.replace(tmp_file, self.checkpoint_file)
+            return True
+        except Exception as e:
+            print(f"⚠️ チェックポイント保存失敗: {e}")
+            return False
+    
+    def restore(self, predictor):
+        """チェックポイントから学習済みモデルを復元（他システムと共有する辞書は中身を置換）"""
+        try:
+            if not os.path.exists(self.checkpoint_file):
+                return False
+            with open(self.checkpoint_file, 'rb') as f:
+                saved = pickle.load(f)
+            if saved['state']['config'] != self.config(predictor):
+                print("🔄 特徴量構成が変わったためチェックポイントは使用しません")
+                return False
+            
+            for attr in ('trained_models', 'scalers', 'model_scores'):
+                getattr(predictor, attr).clear()
+                getattr(predictor, attr).update(saved[attr])
+            predictor.freq_counter.clear()
+            predictor.freq_counter.update(saved['freq_counter'])
+            predictor.pair_freq.counts[...] = saved['pair_counts']
+            predictor.pattern_stats = saved['pattern_stats']
+            predictor.data_count = saved['data_count']
+            self.state = saved['state']
+            print(f"📂 チェックポイントから復元: {len(predictor.trained_models)}モデル（{self.state['draw_count']}回分）")
+            return True
+        except Exception as e:
+            print(f"⚠️ チェックポイント読み込み失敗: {e}")
+            return False
+
+# ミニロト用組み合わせ空間（5-of-31の全169,911通り）
+class MiniLotoCombinationSpace:
+    """全組み合わせをビットマスク(uint32)と数字配列(169911, 5)で一度だけ列挙し、ベクトル化したスコアで上位K口を厳密に選択"""
+    _shared = None
+    
+    def __init__(self):
+        combos = np.fromiter(
+            itertools.combinations(range(1, 32), 5), dtype=np.dtype((np.uint8, 5)), count=169911
+        )
+        self.numbers = combos                                                     # (169911, 5) 昇順の数字1-31
+        self.masks = np.bitwise_or.reduce(
+            np.left_shift(np.uint32(1), combos.astype(np.uint32) - 1), axis=1
+        ).astype(np.uint32)                                                       # ビットn-1が数字n
+        self.sums = combos.sum(axis=1, dtype=np.int16)
+        self.odd_counts = (combos % 2 == 1).sum(axis=1, dtype=np.int8)
+        self.small_counts = (combos <= 15).sum(axis=1, dtype=np.int8)
+        self.consecutive_counts = (np.diff(combos.astype(np.int8), axis=1) == 1).sum(axis=1, dtype=np.int8)
+        self.ranges = (combos[:, 4] - combos[:, 0]).astype(np.int8)
+        # 10の位ごとの個数（1-9, 10-19, 20-29, 30-31）
+        self.decade_counts = np.stack([(combos // 10 == d).sum(axis=1, dtype=np.int8) for d in range(4)], axis=1)
+    
+    @classmethod
+    def shared(cls):
+        """プロセス内で共有する組み合わせ空間（初回のみ列挙）"""
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+    
+    def __len__(self):
+        return len(self.numbers)
+    
+    # 8ビット値ごとの立っているビット数（np.bitwise_countのないnumpy 2.0未満用）
+    _popcount_table = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+    
+    @classmethod
+    def popcount(cls, values):
+        """整数配列の要素ごとの立っているビット数（numpy 2.0未満はバイト単位の表引き）"""
+        if hasattr(np, 'bitwise_count'):
+            return np.bitwise_count(values)
+        values = np.ascontiguousarray(values)
+        per_byte = cls._popcount_table[values.view(np.uint8)]
+        return per_byte.reshape(values.shape + (values.itemsize,)).sum(axis=-1, dtype=np.uint8)
+    
+    @staticmethod
+    def mask_of(numbers):
+        """5数字をビットマスクに変換"""
+        mask = 0
+        for num in numbers:
+            mask |= 1 << (int(num) - 1)
+        return mask
+    
+    def score(self, number_scores=None, pair_counts=None, pair_weight=0.05, mask=None):
+        """全組み合わせのスコア（数字別スコアの合計 + ペア共起の正規化合計×重み、制約外は-inf）"""
+        idx = self.numbers.astype(np.intp) - 1
+        scores = np.zeros(len(self))
+        if number_scores is not None:
+            scores += np.asarray(number_scores, dtype=np.float64)[idx].sum(axis=1)
+        if pair_counts is not None and pair_weight:
+            pair_counts = np.asarray(pair_counts, dtype=np.float64)
+            peak = pair_counts.max()
+            if peak > 0:
+                pair_scores = pair_counts / peak
+                for i, j in itertools.combinations(range(5), 2):
+                    scores += pair_weight * pair_scores[idx[:, i], idx[:, j]]
+        if mask is not None:
+            scores[~mask] = -np.inf
+        return scores
+    
+    def top_indices(self, scores, k):
+        """スコア上位k個の組み合わせ番号（スコア降順、同点は組み合わせ順、-infは除外）"""
+        k = min(int(k), int(np.isfinite(scores).sum()))
+        if k <= 0:
+            return np.array([], dtype=np.intp)
+        candidates = np.argpartition(-scores, k - 1)[:k] if k < len(self) else np.arange(len(self))
+        return candidates[np.lexsort((candidates, -scores[candidates]))]
+    
+    def top_k(self, scores, k):
+        """スコア上位k口（[[5数字], ...], スコア配列）、同点は組み合わせ順"""
+        order = self.top_indices(scores, k)
+        return [self.numbers[i].tolist() for i in order], scores[order]
+
+# ミニロト用パターン制約索引（全組み合わせの属性ビットマップ）
+class MiniLotoConstraintIndex:
+    """全組み合わせのパターン属性ごとに「値v以下」の累積ビットマップ（packbits）を持ち、範囲制約をビット積で解決
+    
+    属性: sum（合計値）、odd（奇数個数）、small（15以下の個数）、consecutive（連続数）、range（最大-最小）、
+    decade_0〜decade_3（1-9, 10-19, 20-29, 30-31の個数）
+    """
+    _shared = None
+    
+    def __init__(self, space):
+        self.size = len(space)
+        attributes = {
+            'sum': space.sums,
+            'odd': space.odd_counts,
+            'small': space.small_counts,
+            'consecutive': space.consecutive_counts,
+            'range': space.ranges
+        }
+        for d in range(space.decade_counts.shape[1]):
+            attributes[f'decade_{d}'] = space.decade_counts[:, d]
+        self.bounds = {}
+        self.bitmaps = {}
+        for name, values in attributes.items():
+            low, high = int(values.min()), int(values.max())
+            levels = np.arange(low, high + 1)
+            self.bounds[name] = (low, high)
+            self.bitmaps[name] = np.packbits(values[None, :] <= levels[:, None], axis=1)
+        self._all = self.bitmaps['sum'][-1].copy()  # 全組み合わせ（末尾の余りビットは0）
+    
+    @classmethod
+    def shared(cls):
+        """プロセス内で共有する索引（初回のみ構築）"""
+        if cls._shared is None:
+            cls._shared = cls(MiniLotoCombinationSpace.shared())
+        return cls._shared
+    
+    def _at_most(self, name, value):
+        """属性nameの値がvalue以下の組み合わせのビットマップ"""
+        low, high = self.bounds[name]
+        value = int(np.floor(value))
+        if value < low:
+            return np.zeros_like(self._all)
+        return self.bitmaps[name][min(value, high) - low]
+    
+    def bitmap(self, **constraints):
+        """制約（属性名=(下限, 上限) または 値、両端含む、Noneは無視）をすべて満たす組み合わせのビットマップ"""
+        result = self._all.copy()
+        for name, bounds in constraints.items():
+            if bounds is None:
+                continue
+            if name not in self.bitmaps:
+                raise ValueError(f"未知の制約属性: {name}")
+            low, high = bounds if isinstance(bounds, (tuple, list)) else (bounds, bounds)
+            result &= self._at_most(name, high) & ~self._at_most(name, np.ceil(low) - 1)
+        return result
+    
+    def mask(self, **constraints):
+        """制約を満たす組み合わせのブール配列(169911,)"""
+        return np.unpackbits(self.bitmap(**constraints), count=self.size).astype(bool)
+    
+    def indices(self, **constraints):
+        """制約を満たす組み合わせ番号"""
+        return np.flatnonzero(self.mask(**constraints))
+    
+    def count(self, **constraints):
+        """制約を満たす組み合わせ数"""
+        return int(MiniLotoCombinationSpace.popcount(self.bitmap(**constraints)).sum())
+    
+    @staticmethod
+    def constraints_from_stats(pattern_stats, width=2.0):
+        """パターン統計（平均合計・標準偏差）から合計値の許容範囲を作成（統計がなければ制約なし）"""
+        if not pattern_stats or 'avg_sum' not in pattern_stats:
+            return {}
+        spread = width * pattern_stats.get('std_sum', 0)
+        if not spread > 0:
+            return {}
+        avg_sum = pattern_stats['avg_sum']
+        return {'sum': (avg_sum - spread, avg_sum + spread)}
+    
+    @staticmethod
+    def constraints_from_targets(pattern_targets, small_boost=0, sum_width=10, count_width=1):
+        """学習パターン（高精度予測の平均合計・奇数個数・小数字数）から制約を作成（小数字重視時は小数字数の下限を平均に）"""
+        constraints = {}
+        if not pattern_targets:
+            return constraints
+        if 'avg_sum' in pattern_targets:
+            avg_sum = pattern_targets['avg_sum']
+            constraints['sum'] = (avg_sum - sum_width, avg_sum + sum_width)
+        if 'avg_odd_count' in pattern_targets:
+            odd = int(round(pattern_targets['avg_odd_count']))
+            constraints['odd'] = (odd - count_width, odd + count_width)
+        if 'avg_small_count' in pattern_targets:
+            small = int(round(pattern_targets['avg_small_count']))
+            constraints['small'] = (small if small_boost > 2 else small - count_width, small + count_width)
+        return constraints
+    
+    def candidate_mask(self, pattern_stats=None, constraints=None):
+        """パターン統計の合計範囲と学習制約を合わせた候補（制約なしはNone、該当なしは学習制約のみ→制約なし）"""
+        for merged in ({**self.constraints_from_stats(pattern_stats), **(constraints or {})}, dict(constraints or {})):
+            if not merged:
+                return None
+            mask = self.mask(**merged)
+            if mask.any():
+                return mask
+        return None
+
+# ミニロト用ポートフォリオ選択（購入口全体での的中カバー率を最大化）
+class MiniLotoPortfolioSelector:
+    """N口の組み合わせを、いずれかの口がk個以上一致する確率（k=3,4,5の重み付き和）が最大になるよう遅延貪欲法で選択
+    
+    抽選結果169,911通りの確率は数字別確率の積に比例する独立近似。一致数は全結果のビットマスクとのpopcountで計算し、
+    候補ごとにk個以上一致する結果（最小kが3なら3,381通り）だけを保持してゲインを疎に評価する。
+    """
+    def __init__(self, enabled=True, match_weights=None, candidates=1000, workers=None):
+        self.enabled = enabled
+        self.match_weights = dict(match_weights or {3: 1.0, 4: 1.0, 5: 1.0})  # 一致数k → 重み
+        self.candidates = candidates  # 全組み合わせの採点上位から評価する候補数
+        # 初回の候補評価を分割するスレッド数（未指定なら環境変数 MINILOTO_CORES → CPU数）
+        if workers is None:
+            workers = int(os.environ.get('MINILOTO_CORES', 0)) or os.cpu_count() or 1
+        self.workers = max(1, int(workers))
+        self.last_report = {}  # {'coverage': {k: 確率}, 'candidates', 'evaluations', 'seconds'}
+    
+    @staticmethod
+    def outcome_weights(space, number_scores):
+        """抽選結果ごとの確率（数字別スコアを確率に正規化し、5数字の積に比例）"""
+        q = np.clip(np.asarray(number_scores, dtype=np.float64), 0, None)
+        if not q.sum() > 0:
+            q = np.ones(31)
+        log_q = np.log(np.maximum(q / q.sum(), 1e-12))
+        log_w = log_q[space.numbers.astype(np.intp) - 1].sum(axis=1)
+        weights = np.exp(log_w - log_w.max())
+        return weights / weights.sum()
+    
+    def _neighborhoods(self, space, masks):
+        """候補ごとの(最小k個以上一致する結果の番号, 一致数)"""
+        min_k = min(self.match_weights)
+        out = []
+        for mask in masks:
+            matches = space.popcount(space.masks & mask)
+            idx = np.flatnonzero(matches >= min_k)
+            out.append((idx, matches[idx]))
+        return out
+    
+    def _all_neighborhoods(self, space, masks):
+        """全候補の近傍をスレッドで分割計算（numpyの演算はGILを解放）"""
+        if self.workers == 1 or len(masks) < 2 * self.workers:
+            return self._neighborhoods(space, masks)
+        chunks = np.array_split(masks, self.workers)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return [item for part in executor.map(lambda chunk: self._neighborhoods(space, chunk), chunks) for item in part]
+    
+    def _gain(self, neighborhood, uncovered):
+        """候補を追加したときに新たにカバーされる確率（uncovered: {k: 未カバー結果の確率}）"""
+        idx, matches = neighborhood
+        return sum(weight * uncovered[k][idx[matches >= k]].sum() for k, weight in self.match_weights.items())
+    
+    def select(self, number_scores, count, pair_counts=None, pattern_stats=None, constraints=None):
+        """count口のポートフォリオ（[[5数字], ...]、constraintsは制約索引の属性範囲、失敗時は空リスト）"""
+        try:
+            start = time.time()
+            space = MiniLotoCombinationSpace.shared()
+            mask = MiniLotoConstraintIndex.shared().candidate_mask(pattern_stats, constraints)
+            candidates = space.top_indices(space.score(number_scores, pair_counts, mask=mask), self.candidates)
+            candidate_masks = space.masks[candidates]
+            weights = self.outcome_weights(space, number_scores)
+            uncovered = {k: weights.copy() for k in self.match_weights}
+            
+            neighborhoods = self._all_neighborhoods(space, candidate_masks)
+            
+            # 遅延貪欲法: 被覆関数は劣モジュラなので、古いゲインは上界として使える
+            heap = [(-self._gain(n, uncovered), i, 0) for i, n in enumerate(neighborhoods)]
+            evaluations = len(heap)
+            heapq.heapify(heap)
+            chosen = []
+            while heap and len(chosen) < count:
+                neg_gain, i, step = heapq.heappop(heap)
+                if step != len(chosen):
+                    evaluations += 1
+                    heapq.heappush(heap, (-self._gain(neighborhoods[i], uncovered), i, len(chosen)))
+                    continue
+                chosen.append(i)
+                idx, matches = neighborhoods[i]
+                for k in uncovered:
+                    uncovered[k][idx[matches >= k]] = 0.0
+            
+            coverage = {k: float(1.0 - uncovered[k].sum()) for k in uncovered}
+            self.last_report = {
+                'coverage': coverage,
+                'candidates': len(candidates),
+                'evaluations': evaluations,
+                'seconds': round(time.time() - start, 3)
+            }
+            summary = ', '.join(f"{k}個以上{p:.2%}" for k, p in sorted(coverage.items()))
+            print(f"🎯 ポートフォリオ選択: {len(chosen)}口（一致確率 {summary}）")
+            return [space.numbers[candidates[i]].tolist() for i in chosen]
+            
+        except Exception as e:
+            print(f"❌ ポートフォリオ選択エラー: {e}")
+            return []
+
+# ミニロト用予測エンジン（アンサンブル投票をセット数分まとめて計算）
+class MiniLotoPredictionEngine:
+    """モデルごとの数字別確率を1回だけ計算し、全セット分の投票を(セット数, 31)行列で集計"""
+    def __init__(self, mode='sample', seed=None, dtype=None):
+        # 'sample': 確率に従う抽出投票、'expected': 抽出なしの期待票数（同一セットになるため1セットのみ）、
+        # 'exact': 期待票数・ペア共起・パターン制約で全組み合わせを採点し上位セットを厳密選択
+        self.mode = mode
+        self.rng = np.random.default_rng(seed)
+        # 確率・投票行列の型（予測器の特徴量の型に合わせる、'float32'でメモリ半減）
+        self.dtype = np.dtype(dtype or MiniLotoFeatureEngine.default_dtype())
+    
+    @staticmethod
+    def model_probability_matrix(models, scaled_rows, dtype=np.float64):
+        """{モデル名: 数字1-31の確率(行数, 31)}（各行和1に正規化、predict_probaのないモデルは予測数字に1票）"""
+        probabilities = {}
+        for name, model in models.items():
+            try:
+                X_scaled = scaled_rows[name]
+                if hasattr(model, 'predict_proba'):
+                    proba = np.asarray(MiniLotoNumberProbabilityModel.number_probabilities(model, X_scaled), dtype=dtype)
+                else:
+                    pred = np.asarray(model.predict(X_scaled)).astype(np.int64)
+                    proba = np.zeros((len(pred), 31), dtype=dtype)
+                    in_range = (pred >= 1) & (pred <= 31)
+                    proba[np.flatnonzero(in_range), pred[in_range] - 1] = 1.0
+                total = proba.sum(axis=1, keepdims=True)
+                probabilities[name] = np.divide(proba, total, out=np.zeros_like(proba), where=total > 0)
+            except Exception as e:
+                print(f"⚠️ {name}: 確率取得エラー {e}")
+        return probabilities
+    
+    @classmethod
+    def model_probabilities(cls, models, scaled_rows, dtype=np.float64):
+        """{モデル名: 数字1-31の確率(31,)}（先頭行のみ、確率が得られないモデルは除外）"""
+        return {
+            name: proba[0]
+            for name, proba in cls.model_probability_matrix(models, scaled_rows, dtype).items()
+            if proba[0].sum() > 0
+        }
+    
+    def vote_matrix(self, probabilities, weights, count, samples_per_model, default_weight=0.33):
+        """(count, 31)の重み付き投票行列（抽出は全モデル・全セット分を1回の乱数生成で実施）"""
+        votes = np.zeros((count, 31), dtype=self.dtype)
+        if not probabilities:
+            return votes
+        names = list(probabilities)
+        proba = np.vstack([probabilities[name] for name in names]).astype(self.dtype, copy=False)  # (モデル数, 31)
+        model_weights = np.array([weights.get(name, default_weight) for name in names], dtype=self.dtype)
+        
+        if self.mode in ('expected', 'exact'):
+            votes += samples_per_model * (model_weights @ proba)
+            return votes
+        
+        # 逆累積分布で一括抽出: 一様乱数(モデル数, count, k) → 数字0-30
+        cdf = np.cumsum(proba, axis=1)
+        cdf[:, -1] = 1.0
+        u = self.rng.random((len(names), count, samples_per_model), dtype=self.dtype)
+        drawn = (u[..., None] >= cdf[:, None, None, :]).sum(axis=-1)
+        flat = (np.arange(count)[None, :, None] * 31 + drawn).reshape(len(names), -1)
+        for m in range(len(names)):
+            votes += model_weights[m] * np.bincount(flat[m], minlength=count * 31).reshape(count, 31)
+        return votes
+    
+    def top_sets(self, votes):
+        """各行の上位5数字（同票は抽出モードでは無作為、期待票モードでは数字順）"""
+        if self.mode == 'expected':
+            return self.ranked_sets(votes)
+        jitter = self.rng.random(votes.shape) * 1e-9
+        top = np.argpartition(-(votes + jitter), 5, axis=1)[:, :5]
+        return [sorted(int(n) + 1 for n in row) for row in top]
+    
+    @staticmethod
+    def ranked_sets(scores):
+        """各行のスコア上位5数字（同点は数字順）"""
+        top = np.argsort(-scores, axis=1, kind='stable')[:, :5]
+        return [sorted(int(n) + 1 for n in row) for row in top]
+    
+    @staticmethod
+    def boost_vector(boosts, dtype=np.float64):
+        """[(数字リスト, 加点), ...]から全セット共通の加点ベクトル(31,)"""
+        vector = np.zeros(31, dtype=dtype)
+        for numbers, amount in boosts or []:
+            for num in numbers:
+                if 1 <= num <= 31:
+                    vector[int(num) - 1] += amount
+        return vector
+    
+    def predict(self, models, scaled_rows, weights, count, samples_per_model, default_weight=0.33, boosts=None,
+                pair_counts=None, pattern_stats=None, constraints=None):
+        """countセットの予測（各セット5数字の昇順リスト、ペア共起・パターン統計・制約は'exact'のみ使用）
+        
+        確率を得られたモデルがなければ空リスト、'expected'は全セット同一のため1セットのみ
+        """
+        probabilities = self.model_probabilities(models, scaled_rows, self.dtype)
+        if not probabilities:
+            print("⚠️ 確率を取得できたモデルがありません")
+            return []
+        rows = count if self.mode == 'sample' else 1  # 抽出なしのモードは投票が全行同一
+        votes = self.vote_matrix(probabilities, weights, rows, samples_per_model, default_weight)
+        votes += self.boost_vector(boosts, self.dtype)
+        if self.mode == 'exact':
+            return self.exact_sets(votes[0], count, pair_counts, pattern_stats, constraints)
+        return self.top_sets(votes)
+    
+    @staticmethod
+    def exact_sets(number_scores, count, pair_counts=None, pattern_stats=None, constraints=None):
+        """全組み合わせを採点して上位countセットを選択（パターン制約を満たす組み合わせがなければ制約なし）"""
+        space = MiniLotoCombinationSpace.shared()
+        mask = MiniLotoConstraintIndex.shared().candidate_mask(pattern_stats, constraints)
+        sets, _ = space.top_k(space.score(number_scores, pair_counts, mask=mask), count)
+        return sets
+    
+    def number_scores(self, models, scaled_rows, weights, samples_per_model, default_weight=0.33, boosts=None):
+        """数字別の期待票数＋加点(31,)（抽出なし、ポートフォリオ選択の入力、確率を得られたモデルがなければNone）"""
+        probabilities = self.model_probabilities(models, scaled_rows, self.dtype)
+        if not probabilities:
+            return None
+        scores = self.boost_vector(boosts, self.dtype)
+        for name, proba in probabilities.items():
+            scores += samples_per_model * weights.get(name, default_weight) * proba
+        return scores
+    
+    def predict_scenarios(self, models, scalers, weights, rows, dtype=None, default_weight=0.33, boosts=None):
+        """シナリオ特徴量行列(シナリオ数, 次元)をモデルごとに1回のtransform・predict_probaで一括推論
+        
+        戻り値: {'probabilities': シナリオ別の重み付き平均確率(シナリオ数, 31), 'sets': シナリオ別の上位5数字, 'models': 使用モデル}
+        （確率を得られたモデルがなければ'sets'は空リスト）
+        """
+        rows = np.atleast_2d(np.asarray(rows, dtype=self.dtype))
+        scaled = MiniLotoFeatureEngine.scale_matrix(scalers, rows, dtype)
+        probabilities = self.model_probability_matrix(models, scaled, self.dtype)
+        combined = np.zeros((len(rows), 31), dtype=self.dtype)
+        total_weight = 0.0
+        for name, proba in probabilities.items():
+            weight = weights.get(name, default_weight)
+            combined += weight * proba
+            total_weight += weight
+        if total_weight > 0:
+            combined /= total_weight
+        return {
+            'probabilities': combined,
+            'sets': self.ranked_sets(combined + self.boost_vector(boosts, self.dtype)) if probabilities else [],
+            'models': list(probabilities)
+        }
+
+# ミニロト用抽選データ取得元（HTTP・ローカルファイル・プロセス内固定データ）
+class MiniLotoFeedResponse:
+    """ローカル取得元の応答（requestsのResponseと同じ属性を持つ最小実装）"""
+    def __init__(self, content=b'', status_code=200, headers=None):
+        self.content = content
+        self.status_code = status_code
+        self.headers = headers or {}
+    
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"HTTP {self.status_code}")
+
+class MiniLotoHTTPSource:
+    """HTTP取得元（セッション再利用・時間予算内での指数バックオフ再試行）"""
+    def __init__(self, url, timeout=10, total_budget=30, max_retries=2, backoff=0.5, session=None):
+        self.url = url
+        self.timeout = timeout            # 1回あたりのタイムアウト（秒）
+        self.total_budget = total_budget  # 再試行込みの合計時間予算（秒）
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.session = session
+    
+    def describe(self):
+        return self.url
+    
+    def _get_session(self):
+        """接続プール付きセッションを一度だけ作成して再利用"""
+        if self.session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=4)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self.session = session
+        return self.session
+    
+    def fetch(self, headers=None):
+        """時間予算内で取得（接続エラー・タイムアウト・5xxのみ再試行）"""
+        deadline = time.monotonic() + self.total_budget
+        last_error = None
+        
+        for attempt in range(self.max_retries + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                response = self._get_session().get(
+                    self.url, headers=headers or {}, timeout=min(self.timeout, remaining)
+                )
+                if response.status_code < 500:
+                    return response
+                last_error = requests.exceptions.HTTPError(f"HTTP {response.status_code}", response=response)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                last_error = e
+            
+            if attempt < self.max_retries:
+                wait = min(self.backoff * (2 ** attempt), max(0.0, deadline - time.monotonic()))
+                print(f"⚠️ 取得失敗（{attempt + 1}回目）: {wait:.1f}秒後に再試行")
+                time.sleep(wait)
+        
+        if last_error is None:
+            last_error = requests.exceptions.Timeout(f"時間予算{self.total_budget}秒を超過")
+        raise last_error
+
+class MiniLotoFileSource:
+    """ローカルCSVファイル取得元（更新時刻・サイズをETagとして利用）"""
+    def __init__(self, path):
+        self.path = path
+    
+    def describe(self):
+        return os.path.abspath(self.path)
+    
+    def fetch(self, headers=None):
+        if not os.path.exists(self.path):
+            return MiniLotoFeedResponse(status_code=404)
+        
+        stat = os.stat(self.path)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        if headers and headers.get('If-None-Match') == etag:
+            return MiniLotoFeedResponse(status_code=304, headers={'ETag': etag})
+        
+        with open(self.path, 'rb') as f:
+            content = f.read()
+        return MiniLotoFeedResponse(content, headers={'ETag': etag})
+
+class MiniLotoFixtureSource:
+    """プロセス内の固定CSV取得元（ベンチマーク・CI用、ネットワーク不要で決定的）"""
+    header = '開催回,日付,第1数字,第2数字,第3数字,第4数字,第5数字,ボーナス数字'
+    
+    def __init__(self, content):
+        self.content = content
+        self.fetch_count = 0
+    
+    def describe(self):
+        return f"fixture（{len(self.content)} bytes, {hashlib.sha1(self.content).hexdigest()[:12]}）"
+    
+    def fetch(self, headers=None):
+        self.fetch_count += 1
+        etag = '"' + hashlib.sha1(self.content).hexdigest() + '"'
+        if headers and headers.get('If-None-Match') == etag:
+            return MiniLotoFeedResponse(status_code=304, headers={'ETag': etag})
+        return MiniLotoFeedResponse(self.content, headers={'ETag': etag})
+    
+    @classmethod
+    def from_draws(cls, numbers, bonus, start_round=1, start_date='1999-04-06', encoding='cp932'):
+        """本数字(N, 5)・ボーナス(N,)から配信と同形式のCSVを作成（週1回開催）"""
+        first_date = datetime.strptime(start_date, '%Y-%m-%d')
+        lines = [cls.header]
+        for i, (main, b) in enumerate(zip(np.asarray(numbers).tolist(), np.asarray(bonus).tolist())):
+            date = (first_date + timedelta(weeks=i)).strftime('%Y/%m/%d')
+            lines.append(f"{start_round + i},{date},{','.join(map(str, main))},{b}")
+        return cls(('\n'.join(lines) + '\n').encode(encoding))
+    
+    @classmethod
+    def synthetic(cls, count=500, seed=0, encoding='cp932'):
+        """乱数シード固定の合成データ（1-31から重複なし6個: 本数字5個 + ボーナス）"""
+        rng = np.random.default_rng(seed)
+        picks = np.argsort(rng.random((count, 31)), axis=1)[:, :6] + 1
+        return cls.from_draws(np.sort(picks[:, :5], axis=1), picks[:, 5], encoding=encoding)
+
+class MiniLotoLocalFeedServer:
+    """同形式のCSVを配信するローカルHTTPスタンドイン（ETag・遅延の再現対応）"""
+    def __init__(self, content, host='127.0.0.1', port=0, delay=0.0):
+        self.content = content
+        self.host = host
+        self.port = port
+        self.delay = delay  # 応答前の遅延（秒）: 低速な配信元の再現用
+        self.request_count = 0
+        self.httpd = None
+        self.thread = None
+    
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/miniloto.csv"
+    
+    def start(self):
+        """バックグラウンドスレッドで配信開始しURLを返す"""
+        feed = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                feed.request_count += 1
+                if feed.delay > 0:
+                    time.sleep(feed.delay)
+                content = feed.content
+                etag = '"' + hashlib.sha1(content).hexdigest() + '"'
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/csv')
+                self.send_header('Content-Length', str(len(content)))
+                self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(content)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self.httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self.url
+    
+    def stop(self):
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+    
+    def __enter__(self):
+        self.start()
+        return self
+    
+    def __exit__(self, *exc):
+        self.stop()
+
 # ミニロト用自動データ取得クラス
 class MiniLotoDataFetcher:
-    def __init__(self):
+    def __init__(self, cache_dir="miniloto_models/data_cache", cache_max_age=6 * 3600,
+                 source=None, offline=None):
         self.csv_url = "https://miniloto.thekyo.jp/data/miniloto.csv"
         # ミニロト用カラム（文字化け対応）
         self.main_columns = ['第1数字', '第2数字', '第3数字', '第4数字', '第5数字']
@@ -31,6 +2102,7 @@ class MiniLotoDataFetcher:
         self.date_column = '日付'
         self.latest_data = None
         self.latest_round = 0
+        self.draw_store = None
         
         # 文字化け対応のカラムマッピング
         self.column_mapping = {
@@ -44,84 +2116,292 @@ class MiniLotoDataFetcher:
             7: 'ボーナス数字'  # 第8カラム
         }
         
-    def fetch_latest_data(self):
-        """最新のミニロトデータを自動取得"""
+        # ローカルキャッシュ（解析済みデータ + 条件付きリクエスト用ヘッダ）
+        self.cache_dir = cache_dir
+        self.cache_file = os.path.join(cache_dir, "miniloto_draws.pkl")
+        self.cache_max_age = cache_max_age  # 秒（この間はネットワークアクセスなし）
+        self.cache_meta = {}
+        self.last_fetch_status = None
+        self.detected_encoding = None
+        self.feature_store = MiniLotoFeatureStore(cache_dir)
+        
+        # 取得元（未指定なら環境変数 MINILOTO_FEED → 公式URL の順）
+        self.source = source or self.source_from_env() or MiniLotoHTTPSource(self.csv_url)
+        # オフラインモード（キャッシュのみ使用、環境変数 MINILOTO_OFFLINE=1 でも有効）
+        if offline is None:
+            offline = os.environ.get('MINILOTO_OFFLINE', '').lower() in ('1', 'true', 'yes')
+        self.offline = offline
+    
+    @staticmethod
+    def source_from_env():
+        """環境変数 MINILOTO_FEED（URLまたはファイルパス）から取得元を作成"""
+        feed = os.environ.get('MINILOTO_FEED')
+        if not feed:
+            return None
+        if feed.startswith(('http://', 'https://')):
+            return MiniLotoHTTPSource(feed)
+        return MiniLotoFileSource(feed)
+        
+    def fetch_latest_data(self, force_refresh=False):
+        """最新のミニロトデータを自動取得（キャッシュ・条件付きリクエスト対応）"""
         try:
             print("🌐 === ミニロト自動データ取得開始 ===")
-            print(f"📡 URL: {self.csv_url}")
+            print(f"📡 取得元: {self.source.describe()}")
+            
+            if self.offline:
+                print("📴 オフラインモード: ネットワークアクセスなし")
+                return self.use_cached_data()
+            
+            # キャッシュ確認（鮮度内ならネットワークアクセスなし）
+            cache = self._load_cache()
+            if cache and not force_refresh and self._is_cache_fresh(cache):
+                age_minutes = (time.time() - cache['meta'].get('fetched_at', 0)) / 60
+                print(f"📂 キャッシュ使用: {len(cache['data'])}件（取得から{age_minutes:.0f}分）")
+                self.latest_data = cache['data']
+                self.cache_meta = cache['meta']
+                self.last_fetch_status = 'cache'
+                return self._finalize_latest_data()
+            
+            # 条件付きリクエスト（ETag / Last-Modified）
+            headers = self._conditional_headers(cache)
+            response = self.source.fetch(headers)
+            
+            if response.status_code == 304 and cache:
+                print("✅ 更新なし（304 Not Modified）: キャッシュを使用")
+                self.latest_data = cache['data']
+                self.cache_meta = dict(cache['meta'], fetched_at=time.time())
+                self.last_fetch_status = 'not_modified'
+                self._save_cache(self.latest_data, self.cache_meta)
+                return self._finalize_latest_data()
             
-            # CSVデータを取得
-            response = requests.get(self.csv_url, timeout=30)
             response.raise_for_status()
+            content = response.content
+            
+            print(f"✅ データ取得成功: {len(content)} bytes")
+            
+            meta = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'content_length': len(content),
+                'content_digest': hashlib.sha1(content).hexdigest(),
+                'encoding': cache['meta'].get('encoding') if cache else None,
+                'fetched_at': time.time(),
+                'source': self.source.describe()
+            }
             
-            print(f"✅ データ取得成功: {len(response.content)} bytes")
+            cached_length = cache['meta'].get('content_length', 0) if cache else 0
             
-            # CSVをパース（文字エンコーディングを考慮）
-            try:
-                # shift-jisで試す（日本のCSVの一般的なエンコーディング）
-                csv_content = response.content.decode('shift-jis')
-                df = pd.read_csv(io.StringIO(csv_content))
-            except:
+            unchanged = cache and meta['content_digest'] == cache['meta'].get('content_digest')
+            new_rows = None
+            if not unchanged and cache and self._is_appended_content(content, cache['meta']):
+                # 追記分のみ解析（失敗時は配信側の列・ヘッダ変更とみなして全体を再解析）
                 try:
-                    # UTF-8で試す
-                    csv_content = response.content.decode('utf-8')
-                    df = pd.read_csv(io.StringIO(csv_content))
-                except:
-                    # cp932で試す
-                    csv_content = response.content.decode('cp932')
-                    df = pd.read_csv(io.StringIO(csv_content))
-            
-            print(f"📊 データ読み込み: {len(df)}件")
-            
-            # カラム名の正規化（位置ベースで安全に処理）
-            if len(df.columns) >= 8:
-                # 新しいカラム名でデータフレームを再構築
-                normalized_data = {}
-                
-                for i, new_col_name in self.column_mapping.items():
-                    if i < len(df.columns):
-                        normalized_data[new_col_name] = df.iloc[:, i].values
-                
-                # 正規化されたデータフレームを作成
-                self.latest_data = pd.DataFrame(normalized_data)
-                
-                # データ型の確認と修正
-                for col in ['開催回', '第1数字', '第2数字', '第3数字', '第4数字', '第5数字', 'ボーナス数字']:
-                    if col in self.latest_data.columns:
-                        self.latest_data[col] = pd.to_numeric(self.latest_data[col], errors='coerce')
-                
-                # 不正なデータを除去
-                self.latest_data = self.latest_data.dropna()
-                
-                print(f"📋 正規化完了: {list(self.latest_data.columns)}")
-                
-                # 最新回を取得
-                if '開催回' in self.latest_data.columns:
-                    self.latest_round = int(self.latest_data['開催回'].max())
-                    print(f"🎯 最新開催回: 第{self.latest_round}回")
-                    
-                    # 最新データの確認
-                    latest_entry = self.latest_data[self.latest_data['開催回'] == self.latest_round].iloc[0]
-                    print(f"📅 最新回日付: {latest_entry.get('日付', 'N/A')}")
-                    
-                    main_nums = [int(latest_entry[f'第{i}数字']) for i in range(1, 6)]
-                    bonus_num = int(latest_entry['ボーナス数字'])
-                    print(f"🎲 最新回当選番号: {main_nums} + ボーナス{bonus_num}")
-                
-                print("✅ ミニロトデータ取得完了")
-                return True
+                    new_rows = self._parse_csv_content(
+                        content[cached_length:], has_header=False, encoding=meta['encoding']
+                    )
+                except Exception as e:
+                    print(f"⚠️ 差分解析エラー: {e}")
+                if new_rows is None:
+                    print("⚠️ 差分解析に失敗したため全体を再解析します")
+            
+            if unchanged:
+                # バイト長・内容ともに同一 → 再解析不要
+                print("✅ 内容に変更なし: 再解析をスキップ")
+                self.latest_data = cache['data']
+                self.last_fetch_status = 'unchanged'
+            elif new_rows is not None:
+                # 追記分を既存テーブルに連結
+                print(f"➕ 差分解析: 新規{len(new_rows)}件を追加")
+                self.latest_data = pd.concat([cache['data'], new_rows], ignore_index=True)
+                self.last_fetch_status = 'incremental'
             else:
-                print("❌ CSVの構造が期待と異なります")
-                return False
+                df = self._parse_csv_content(content, has_header=True)
+                if df is None:
+                    print("❌ CSVの構造が期待と異なります")
+                    return False
+                self.latest_data = df
+                self.last_fetch_status = 'full'
+                meta['encoding'] = self.detected_encoding
+            
+            # 追記判定用に末尾が改行のときのみ差分解析の基点を記録
+            meta['appendable'] = content.endswith(b'\n')
+            self.cache_meta = meta
+            self._save_cache(self.latest_data, meta)
+            
+            return self._finalize_latest_data()
             
         except requests.exceptions.RequestException as e:
             print(f"❌ ネットワークエラー: {e}")
+            # 配信元の障害時は前回キャッシュで継続
+            if os.path.exists(self.cache_file):
+                print("🔄 前回のキャッシュデータで継続します")
+                return self.use_cached_data(status='stale_cache')
             return False
         except Exception as e:
             print(f"❌ データ取得エラー: {e}")
             print(f"詳細: {traceback.format_exc()}")
             return False
     
+    def use_cached_data(self, status='offline'):
+        """ネットワークを使わずキャッシュ済みデータのみで準備（オフライン・回復用）"""
+        cache = self._load_cache()
+        if not cache:
+            print("❌ 利用可能なキャッシュがありません")
+            return False
+        
+        age_hours = (time.time() - cache['meta'].get('fetched_at', 0)) / 3600
+        print(f"📂 キャッシュデータ使用: {len(cache['data'])}件（取得から{age_hours:.1f}時間）")
+        self.latest_data = cache['data']
+        self.cache_meta = cache['meta']
+        self.last_fetch_status = status
+        return self._finalize_latest_data()
+    
+    def _detect_encoding(self, content, sample_size=4096):
+        """先頭の一部だけでエンコーディングを一度判定"""
+        if content[:3] == b'\xef\xbb\xbf':
+            return 'utf-8-sig'
+        
+        sample = content[:sample_size]
+        if len(content) > sample_size:
+            # 途中で切れたマルチバイト文字を避けるため最後の改行までで判定
+            cut = sample.rfind(b'\n')
+            if cut > 0:
+                sample = sample[:cut]
+        
+        try:
+            sample.decode('utf-8')
+            return 'utf-8'
+        except UnicodeDecodeError:
+            # cp932はshift-jisの上位互換（機種依存文字も扱える）
+            return 'cp932'
+    
+    def _parse_csv_content(self, content, has_header=True, encoding=None):
+        """CSVバイト列を文字列化せずに直接解析し、型付きの正規化済みデータフレームを返す"""
+        if encoding is None:
+            encoding = self._detect_encoding(content)
+        self.detected_encoding = encoding
+        
+        names = list(self.column_mapping.values())
+        numeric_columns = [col for col in names if col != self.date_column]
+        read_options = {
+            'encoding': encoding,
+            'header': 0 if has_header else None,
+            'names': names,
+            'usecols': range(len(names)),  # 位置ベースで先頭8カラムのみ
+        }
+        
+        # バイト列をそのままパーサへ渡し、数値カラムは読み込み時に型付け
+        try:
+            df = pd.read_csv(
+                io.BytesIO(content),
+                dtype={**{col: np.float64 for col in numeric_columns}, self.date_column: str},
+                **read_options
+            )
+        except pd.errors.ParserError:
+            # カラム不足（CSVの構造が期待と異なる）
+            return None
+        except ValueError:
+            # 数値カラムに不正な文字列が混入している場合のみ文字列で読み直して変換
+            df = pd.read_csv(io.BytesIO(content), dtype=str, **read_options)
+            for col in numeric_columns:
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+        
+        print(f"📊 データ読み込み: {len(df)}件（{encoding}）")
+        
+        # 不正行を一括マスクで除去し、整数配列として確定
+        numeric = df[numeric_columns].to_numpy(dtype=np.float64)
+        valid = np.isfinite(numeric).all(axis=1) & df[self.date_column].notna().to_numpy()
+        numeric = numeric[valid].astype(np.int64)
+        
+        normalized = pd.DataFrame({
+            col: (df[self.date_column].to_numpy()[valid] if col == self.date_column
+                  else numeric[:, numeric_columns.index(col)])
+            for col in names
+        })
+        
+        print(f"📋 正規化完了: {list(normalized.columns)}")
+        return normalized
+    
+    def _finalize_latest_data(self):
+        """最新回情報を更新して表示"""
+        # 列指向ストアを一度だけ構築し、特徴量ストアの特徴量を付与
+        self.draw_store = self.feature_store.attach(MiniLotoDrawStore.from_dataframe(self.latest_data))
+        
+        # 最新回を取得
+        if '開催回' in self.latest_data.columns and len(self.latest_data) > 0:
+            self.latest_round = int(self.latest_data['開催回'].max())
+            print(f"🎯 最新開催回: 第{self.latest_round}回")
+            
+            # 最新データの確認
+            latest_entry = self.latest_data[self.latest_data['開催回'] == self.latest_round].iloc[0]
+            print(f"📅 最新回日付: {latest_entry.get('日付', 'N/A')}")
+            
+            main_nums = [int(latest_entry[f'第{i}数字']) for i in range(1, 6)]
+            bonus_num = int(latest_entry['ボーナス数字'])
+            print(f"🎲 最新回当選番号: {main_nums} + ボーナス{bonus_num}")
+        
+        print("✅ ミニロトデータ取得完了")
+        return True
+    
+    def _is_cache_fresh(self, cache):
+        """キャッシュが鮮度内かを判定"""
+        fetched_at = cache['meta'].get('fetched_at', 0)
+        return (time.time() - fetched_at) < self.cache_max_age
+    
+    def _is_appended_content(self, content, cached_meta):
+        """取得内容がキャッシュ済み内容への追記のみかを判定"""
+        cached_length = cached_meta.get('content_length', 0)
+        if not cached_meta.get('appendable') or cached_length == 0 or len(content) <= cached_length:
+            return False
+        return hashlib.sha1(content[:cached_length]).hexdigest() == cached_meta.get('content_digest')
+    
+    def _conditional_headers(self, cache):
+        """条件付きリクエスト用ヘッダを作成"""
+        headers = {}
+        if cache:
+            if cache['meta'].get('etag'):
+                headers['If-None-Match'] = cache['meta']['etag']
+            if cache['meta'].get('last_modified'):
+                headers['If-Modified-Since'] = cache['meta']['last_modified']
+        return headers
+    
+    def _load_cache(self):
+        """ローカルキャッシュを読み込み（別の取得元で作成されたキャッシュは無いものとして扱う）"""
+        try:
+            if not os.path.exists(self.cache_file):
+                return None
+            with open(self.cache_file, 'rb') as f:
+                cache = pickle.load(f)
+            if cache.get('data') is None or 'meta' not in cache:
+                return None
+            if cache['meta'].get('source') != self.source.describe():
+                print(f"⚠️ キャッシュの取得元が異なるため使用しません: {cache['meta'].get('source', '不明')}")
+                return None
+            return cache
+        except Exception as e:
+            print(f"⚠️ キャッシュ読み込み失敗: {e}")
+            return None
+    
+    def _save_cache(self, data, meta):
+        """解析済みデータとヘッダ情報をローカルキャッシュに保存"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_file = self.cache_file + '.tmp'
+            with open(tmp_file, 'wb') as f:
+                pickle.dump({'data': data, 'meta': meta}, f)
+            os.replace(tmp_file, self.cache_file)
+            return True
+        except Exception as e:
+            print(f"⚠️ キャッシュ保存失敗: {e}")
+            return False
+    
+    def clear_cache(self):
+        """ローカルキャッシュを削除"""
+        if os.path.exists(self.cache_file):
+            os.remove(self.cache_file)
+        self.cache_meta = {}
+        self.feature_store.clear()
+    
     def get_next_round_info(self):
         """次回開催回の情報を取得"""
         if self.latest_round == 0:
@@ -142,11 +2422,18 @@ class MiniLotoDataFetcher:
         if self.latest_data is None:
             return None
         return self.latest_data
+    
+    def get_draw_store(self):
+        """列指向の抽選データストアを返す"""
+        if self.draw_store is None and self.latest_data is not None:
+            self.draw_store = self.feature_store.attach(MiniLotoDrawStore.from_dataframe(self.latest_data))
+        return self.draw_store
 
 # ミニロト用予測記録管理クラス
 class MiniLotoPredictionHistory:
     def __init__(self):
         self.predictions = []  # [{'round': int, 'date': str, 'predictions': list, 'actual': list or None}]
+        self.round_index = {}  # 開催回 → 予測エントリ
         self.accuracy_stats = {}
         
     def add_prediction_with_round(self, predictions, target_round, date=None):
@@ -163,51 +2450,52 @@ class MiniLotoPredictionHistory:
             'verified': False
         }
         self.predictions.append(entry)
+        self.round_index.setdefault(target_round, entry)
         print(f"📝 予測記録: 第{target_round}回 - {date} - {len(predictions)}セット")
         
     def find_prediction_by_round(self, round_number):
-        """指定開催回の予測を検索"""
+        """指定開催回の予測を検索（開催回索引でO(1)）"""
+        return self.round_index.get(round_number)
+    
+    def _rebuild_round_index(self):
+        """開催回→予測エントリ索引を再構築（同一回は先頭を優先）"""
+        self.round_index = {}
         for entry in self.predictions:
-            if entry['round'] == round_number:
-                return entry
-        return None
+            self.round_index.setdefault(entry['round'], entry)
     
     def auto_verify_with_data(self, latest_data, round_col='開催回'):
-        """最新データと自動照合"""
+        """最新データと自動照合（未照合分を一括結合）"""
         verified_count = 0
-        main_cols = ['第1数字', '第2数字', '第3数字', '第4数字', '第5数字']
         
-        for entry in self.predictions:
-            if entry['verified']:
-                continue
+        pending = [entry for entry in self.predictions if not entry['verified'] and entry['predictions']]
+        if not pending:
+            return verified_count
+        
+        # 開催回で一括結合（該当回がない予測は-1）
+        store = MiniLotoDrawStore.from_data(latest_data)
+        rows = store.lookup_rows([entry['round'] for entry in pending])
+        joined = [(entry, row) for entry, row in zip(pending, rows) if row >= 0]
+        
+        if joined:
+            # 全予測セットの一致数をまとめて計算
+            set_counts = [len(entry['predictions']) for entry, _ in joined]
+            all_sets = [pred_set for entry, _ in joined for pred_set in entry['predictions']]
+            owner_rows = np.repeat([row for _, row in joined], set_counts)
+            all_matches = MiniLotoDrawStore.match_counts(all_sets, store.numbers[owner_rows])
+            
+            for (entry, row), matches in zip(joined, np.split(all_matches, np.cumsum(set_counts)[:-1])):
+                actual_numbers = store.numbers[row].tolist()
+                matches = matches.tolist()
                 
-            # 該当する開催回のデータを検索
-            matching_data = latest_data[latest_data[round_col] == entry['round']]
-            
-            if len(matching_data) > 0:
-                actual_row = matching_data.iloc[0]
-                actual_numbers = []
-                for col in main_cols:
-                    if col in actual_row.index:
-                        actual_numbers.append(int(actual_row[col]))
+                entry['actual'] = actual_numbers
+                entry['matches'] = matches
+                entry['verified'] = True
+                verified_count += 1
                 
-                if len(actual_numbers) == 5:
-                    entry['actual'] = actual_numbers
-                    
-                    # 各予測セットとの一致数を計算
-                    matches = []
-                    for pred_set in entry['predictions']:
-                        match_count = len(set(pred_set) & set(actual_numbers))
-                        matches.append(match_count)
-                    
-                    entry['matches'] = matches
-                    entry['verified'] = True
-                    verified_count += 1
-                    
-                    print(f"✅ 自動照合完了: 第{entry['round']}回")
-                    print(f"   当選番号: {actual_numbers}")
-                    print(f"   一致数: {matches}")
-                    print(f"   最高一致: {max(matches)}個")
+                print(f"✅ 自動照合完了: 第{entry['round']}回")
+                print(f"   当選番号: {actual_numbers}")
+                print(f"   一致数: {matches}")
+                print(f"   最高一致: {max(matches)}個")
         
         if verified_count > 0:
             self._update_accuracy_stats()
@@ -277,6 +2565,7 @@ class MiniLotoPredictionHistory:
             if hasattr(self, 'saved_data') and self.saved_data:
                 self.predictions = self.saved_data['predictions']
                 self.accuracy_stats = self.saved_data['accuracy_stats']
+                self._rebuild_round_index()
                 print(f"📂 予測履歴をメモリから読み込み: {len(self.predictions)}回分")
                 return True
             else:
@@ -305,7 +2594,7 @@ class MiniLotoBasicPredictor:
             'random_forest': RandomForestClassifier(
                 n_estimators=100, max_depth=10, random_state=42, n_jobs=-1
             ),
-            'gradient_boost': GradientBoostingClassifier(
+            'gradient_boost': MiniLotoEstimatorFactory.gradient_boost(
                 n_estimators=80, max_depth=6, random_state=42
             )
         }
@@ -316,9 +2605,26 @@ class MiniLotoBasicPredictor:
             'gradient_boost': 0.4
         }
         
+        # 学習ターゲット形式（'multilabel': 1抽選1行の(N, 31)、'scalar': 従来の5行複製）
+        self.target_mode = 'multilabel'
+        # 鮮度特徴量ブロック（経過回数・出現回数・ホット/コールド）を追加するか
+        self.include_recency = False
+        # 特徴量・スケーリング済み行列・確率の型（'float32'でメモリ半減）
+        self.feature_dtype = MiniLotoFeatureEngine.default_dtype()
+        self.memory_stats = {}
+        # 構成モデルの並列学習（コア予算は環境変数 MINILOTO_CORES またはCPU数）
+        self.parallel_trainer = MiniLotoParallelTrainer()
+        # 予測セット生成（mode='expected'で抽出なしの期待票数）
+        self.prediction_engine = MiniLotoPredictionEngine(dtype=self.feature_dtype)
+        # 評価方式（'refit': 時系列CV + 全行で再学習、'fold_ensemble': フォールドモデルの平均を使用）
+        self.evaluation_mode = 'refit'
+        self.oof_predictions = {}
+        # 新規回のみの追加学習（定期的に全件再学習）
+        self.incremental_trainer = MiniLotoIncrementalTrainer('basic')
+        
         # データ分析
         self.freq_counter = Counter()
-        self.pair_freq = Counter()
+        self.pair_freq = MiniLotoPairMatrix()
         self.pattern_stats = {}
         
         # 学習状態
@@ -332,103 +2638,36 @@ class MiniLotoBasicPredictor:
         print("✅ 基本予測システム初期化完了")
     
     def create_basic_features(self, data):
-        """基本的な14次元特徴量エンジニアリング"""
+        """基本的な14次元特徴量エンジニアリング（ターゲット形式はself.target_mode）"""
         try:
             print("🔧 14次元特徴量エンジニアリング開始")
             
-            features = []
-            targets = []
-            main_cols = ['第1数字', '第2数字', '第3数字', '第4数字', '第5数字']
+            store = MiniLotoDrawStore.from_data(data)
             
-            for i in range(len(data)):
-                try:
-                    current = []
-                    for col in main_cols:
-                        if col in data.columns:
-                            current.append(int(data.iloc[i][col]))
-                    
-                    if len(current) != 5:
-                        continue
-                    
-                    # ミニロトの範囲チェック（1-31）
-                    if not all(1 <= x <= 31 for x in current):
-                        continue
-                    if len(set(current)) != 5:  # 重複チェック
-                        continue
-                    
-                    # 基本統計（頻出カウント）
-                    for num in current:
-                        self.freq_counter[num] += 1
-                    
-                    # ペア分析
-                    for j in range(len(current)):
-                        for k in range(j+1, len(current)):
-                            pair = tuple(sorted([current[j], current[k]]))
-                            self.pair_freq[pair] += 1
-                    
-                    # 14次元特徴量（ミニロト最適化版）
-                    sorted_nums = sorted(current)
-                    gaps = [sorted_nums[j+1] - sorted_nums[j] for j in range(4)]  # 4個のギャップ
-                    
-                    feat = [
-                        float(np.mean(current)),           # 1. 平均値
-                        float(np.std(current)),            # 2. 標準偏差
-                        float(np.sum(current)),            # 3. 合計値
-                        float(sum(1 for x in current if x % 2 == 1)),  # 4. 奇数個数
-                        float(max(current)),               # 5. 最大値
-                        float(min(current)),               # 6. 最小値
-                        float(np.median(current)),         # 7. 中央値
-                        float(max(current) - min(current)), # 8. 範囲
-                        float(len([j for j in range(len(sorted_nums)-1) 
-                                 if sorted_nums[j+1] - sorted_nums[j] == 1])), # 9. 連続数
-                        float(current[0]),                 # 10. 第1数字
-                        float(current[2]),                 # 11. 第3数字（中央）
-                        float(current[4]),                 # 12. 第5数字（最後）
-                        float(np.mean(gaps)),              # 13. 平均ギャップ
-                        float(len([x for x in current if x <= 15])), # 14. 小数字数（≤15）
-                    ]
-                    
-                    # 次回予測ターゲット
-                    if i < len(data) - 1:
-                        next_nums = []
-                        for col in main_cols:
-                            if col in data.columns:
-                                next_nums.append(int(data.iloc[i+1][col]))
-                        
-                        if len(next_nums) == 5:
-                            for target_num in next_nums:
-                                features.append(feat.copy())
-                                targets.append(target_num)
-                        
-                except Exception as e:
-                    continue
-                
-                if (i + 1) % 100 == 0:
-                    print(f"  特徴量進捗: {i+1}/{len(data)}件")
+            # 基本統計（頻出カウント）を一括集計
+            self.freq_counter.update(store.number_counts())
+            
+            # ペア分析（有効行のみ、31×31共起行列に一括加算）
+            self.pair_freq.add_draws(store.clean_numbers)
+            
+            # 14次元特徴量と次回予測ターゲットを一括計算
+            features, targets = MiniLotoFeatureEngine.training_set(
+                store, target_mode=self.target_mode, include_recency=self.include_recency,
+                dtype=self.feature_dtype
+            )
             
             # パターン統計
             if len(features) > 0:
-                sum_patterns = []
-                for i in range(len(data)):
-                    try:
-                        current = []
-                        for col in main_cols:
-                            if col in data.columns:
-                                current.append(int(data.iloc[i][col]))
-                        if len(current) == 5 and all(1 <= x <= 31 for x in current) and len(set(current)) == 5:
-                            sum_patterns.append(sum(current))
-                    except:
-                        continue
-                
-                if sum_patterns:
+                sum_stats = store.sum_stats()
+                if sum_stats is not None:
                     self.pattern_stats = {
-                        'avg_sum': float(np.mean(sum_patterns)),
-                        'std_sum': float(np.std(sum_patterns)),
+                        'avg_sum': sum_stats[0],
+                        'std_sum': sum_stats[1],
                         'most_frequent_pairs': self.pair_freq.most_common(10)
                     }
             
             print(f"✅ 14次元特徴量完成: {len(features)}個")
-            return np.array(features), np.array(targets)
+            return features, targets
             
         except Exception as e:
             print(f"❌ 特徴量エンジニアリングエラー: {e}")
@@ -441,46 +2680,96 @@ class MiniLotoBasicPredictor:
             
             # 14次元特徴量作成
             X, y = self.create_basic_features(data)
-            if X is None or len(X) < 100:
-                print(f"❌ 特徴量不足: {len(X) if X is not None else 0}件")
+            sample_count = MiniLotoFeatureEngine.sample_count(X, y)
+            if sample_count < 100:
+                print(f"❌ 特徴量不足: {sample_count}件")
                 return False
             
             self.data_count = len(data)
             
+            # スケーリング（全モデルで共有する1個のスケーラーと1個のスケール済み行列）
+            scaler = StandardScaler()
+            X_scaled = scaler.fit_transform(X)
+            scaled_bytes = X_scaled.nbytes
+            
             # 各モデルの学習
             print("🤖 基本モデル学習中...")
             
-            for name, model in self.models.items():
-                try:
-                    print(f"  {name} 学習中...")
-                    
-                    # スケーリング
-                    scaler = StandardScaler()
-                    X_scaled = scaler.fit_transform(X)
-                    self.scalers[name] = scaler
-                    
-                    # 学習
-                    model.fit(X_scaled, y)
-                    
-                    # クロスバリデーション評価
-                    cv_score = np.mean(cross_val_score(model, X_scaled, y, cv=3))
-                    
-                    self.trained_models[name] = model
+            print(f"  {', '.join(self.models)} 学習中...")
+            
+            # 構成モデルと時系列CVのフォールドを並列学習（(N, 31)ターゲットは数字別確率モデル）
+            results = self.parallel_trainer.fit(
+                self.models, X_scaled, y, cv=3, refit=self.evaluation_mode == 'refit'
+            )
+            self.oof_predictions = self.parallel_trainer.last_oof
+            
+            for name, (model, cv_score, error) in results.items():
+                if error is not None:
+                    print(f"    ❌ {name}: エラー {error}")
+                    continue
+                
+                self.scalers[name] = scaler
+                self.trained_models[name] = model
+                if cv_score is not None:
                     self.model_scores[name] = cv_score
-                    
                     print(f"    ✅ {name}: CV精度 {cv_score*100:.2f}%")
-                    
-                except Exception as e:
-                    print(f"    ❌ {name}: エラー {e}")
-                    continue
+                else:
+                    print(f"    ✅ {name}: CV精度 未評価（検証フォールドが時間予算内に終了せず）")
+                if self.parallel_trainer.last_report[name]['status'] == 'partial':
+                    print(f"    ⏱️ {name}: 時間予算で打ち切り（終了した学習分を使用）")
+            
+            if all(error is not None for _, _, error in results.values()):
+                print("❌ 基本モデル学習失敗: 学習を終えたモデルがありません")
+                return False
             
             print(f"✅ 基本モデル学習完了: {len(self.trained_models)}モデル")
+            self.memory_stats = self.training_memory_stats(X, y, scaled_bytes)
             return True
             
         except Exception as e:
             print(f"❌ 基本モデル学習エラー: {str(e)}")
             return False
     
+    def training_memory_stats(self, X, y, scaled_bytes):
+        """学習時の段階別保持バイト数（実在する配列のみ、確率は時系列CVの検証区間確率）"""
+        store = getattr(self.data_fetcher, 'feature_store', None)
+        return {
+            'feature_store': MiniLotoFeatureEngine.nbytes(getattr(store, 'features', None)),
+            'features': MiniLotoFeatureEngine.nbytes(X),
+            'targets': MiniLotoFeatureEngine.nbytes(y),
+            'scaled': scaled_bytes,
+            'probabilities': MiniLotoFeatureEngine.nbytes(self.oof_predictions),
+        }
+    
+    def memory_report(self):
+        """直近の学習で保持した配列のバイト数を段階別に表示"""
+        if not self.memory_stats:
+            print("📝 メモリ統計なし（学習後に利用可能）")
+            return {}
+        return MiniLotoFeatureEngine.memory_report(self.memory_stats, f"メモリ使用量（{self.feature_dtype}）")
+    
+    def predict_scenarios(self, grid):
+        """シナリオ格子（例: {'合計値': [70, 80, 90], '奇数個数': [2, 3]}）を一括推論し、シナリオ別の確率と予測セットを返す"""
+        try:
+            if not self.trained_models:
+                print("❌ 学習済みモデルがありません")
+                return None
+            
+            scenarios, rows = MiniLotoFeatureEngine.scenario_grid(grid)
+            rows = MiniLotoFeatureEngine.prediction_rows(
+                rows, self.data_fetcher.get_draw_store(), self.include_recency
+            )
+            result = self.prediction_engine.predict_scenarios(
+                self.trained_models, self.scalers, self.model_weights, rows, self.feature_dtype
+            )
+            result['scenarios'] = scenarios
+            print(f"✅ シナリオ一括予測完了: {len(scenarios)}シナリオ × {len(result['models'])}モデル")
+            return result
+            
+        except Exception as e:
+            print(f"❌ シナリオ予測エラー: {e}")
+            return None
+    
     def basic_predict(self, count=20):
         """基本アンサンブル予測実行"""
         try:
@@ -491,72 +2780,30 @@ class MiniLotoBasicPredictor:
             # 基準特徴量（ミニロト用）
             if hasattr(self, 'pattern_stats') and self.pattern_stats:
                 avg_sum = self.pattern_stats.get('avg_sum', 80)  # ミニロトの平均合計
-                base_features = [
-                    avg_sum / 5,        # 1. 平均値（16程度）
-                    6.0,                # 2. 標準偏差
-                    avg_sum,            # 3. 合計値（80程度）
-                    2.5,                # 4. 奇数個数
-                    28.0,               # 5. 最大値
-                    5.0,                # 6. 最小値
-                    16.0,               # 7. 中央値
-                    23.0,               # 8. 範囲
-                    1.0,                # 9. 連続数
-                    8.0,                # 10. 第1数字
-                    16.0,               # 11. 第3数字
-                    24.0,               # 12. 第5数字
-                    5.5,                # 13. 平均ギャップ
-                    2.5                 # 14. 小数字数
-                ]
+                base_features = MiniLotoFeatureEngine.baseline_row({
+                    '平均値': avg_sum / 5,  # 16程度
+                    '合計値': avg_sum,      # 80程度
+                })
             else:
                 # デフォルト値
-                base_features = [16.0, 6.0, 80.0, 2.5, 28.0, 5.0, 16.0, 23.0, 1.0, 8.0, 16.0, 24.0, 5.5, 2.5]
+                base_features = MiniLotoFeatureEngine.baseline_row()
             
-            predictions = []
+            # 鮮度特徴量ブロック（学習時に有効化した場合のみ最新回分を付加）
+            base_features = MiniLotoFeatureEngine.prediction_row(
+                base_features, self.data_fetcher.get_draw_store(), self.include_recency
+            )
             
-            for i in range(count):
-                # 各モデルの予測を収集
-                ensemble_votes = Counter()
-                
-                for name, model in self.trained_models.items():
-                    try:
-                        scaler = self.scalers[name]
-                        X_scaled = scaler.transform([base_features])
-                        
-                        # 複数回予測
-                        for _ in range(6):  # ミニロト用に調整
-                            if hasattr(model, 'predict_proba'):
-                                proba = model.predict_proba(X_scaled)[0]
-                                classes = model.classes_
-                                if len(classes) > 0:
-                                    selected = np.random.choice(classes, p=proba/proba.sum())
-                                    if 1 <= selected <= 31:
-                                        weight = self.model_weights.get(name, 0.5)
-                                        ensemble_votes[int(selected)] += weight
-                            else:
-                                pred = model.predict(X_scaled)[0]
-                                if 1 <= pred <= 31:
-                                    weight = self.model_weights.get(name, 0.5)
-                                    ensemble_votes[int(pred)] += weight
-                                    
-                    except Exception as e:
-                        continue
-                
-                # 頻出数字と組み合わせ
-                frequent_nums = [num for num, _ in self.freq_counter.most_common(12)]
-                for num in frequent_nums[:8]:
-                    ensemble_votes[num] += 0.1
-                
-                # 上位5個を選択
-                top_numbers = [num for num, _ in ensemble_votes.most_common(5)]
-                
-                # 不足分をランダム補完
-                while len(top_numbers) < 5:
-                    candidate = np.random.randint(1, 32)
-                    if candidate not in top_numbers:
-                        top_numbers.append(candidate)
-                
-                final_pred = sorted([int(x) for x in top_numbers[:5]])
-                predictions.append(final_pred)
+            # 基準特徴量のスケーリングは予測呼び出しごとに1回（全セット・全モデルで再利用）
+            scaled_rows = MiniLotoFeatureEngine.scale_rows(self.scalers, base_features, self.feature_dtype)
+            
+            # 全セット分の投票を一括計算（モデルごとの確率は1回、抽出は1回の乱数生成）
+            predictions = self.prediction_engine.predict(
+                self.trained_models, scaled_rows, self.model_weights, count,
+                samples_per_model=6,  # ミニロト用に調整
+                default_weight=0.5,
+                boosts=[([num for num, _ in self.freq_counter.most_common(12)][:8], 0.1)],  # 頻出数字と組み合わせ
+                pair_counts=self.pair_freq.counts, pattern_stats=self.pattern_stats
+            )
             
             return predictions
             
@@ -576,14 +2823,14 @@ class MiniLotoBasicPredictor:
                 print("❌ データ取得失敗")
                 return [], {}
             
-            training_data = self.data_fetcher.get_data_for_training()
+            training_data = self.data_fetcher.get_draw_store()
             next_info = self.data_fetcher.get_next_round_info()
             
             print(f"📊 学習データ: {len(training_data)}件")
             print(f"🎯 予測対象: {next_info['prediction_target']}")
             
-            # 2. 基本モデル学習
-            success = self.train_basic_models(training_data)
+            # 2. 基本モデル学習（学習済みなら新規回のみ追加学習）
+            success = self.incremental_trainer.ensure(self, training_data, self.train_basic_models)
             if not success:
                 print("❌ 学習失敗")
                 return [], {}
@@ -625,7 +2872,8 @@ class MiniLotoBasicPredictor:
             print("\n" + "="*80)
             print("📊 分析結果")
             print("="*80)
-            print(f"特徴量次元: 14次元（ミニロト最適化版）")
+            feature_schema = MiniLotoFeatureEngine.schema_for_models(self.scalers, self.include_recency)
+            print(f"特徴量次元: {feature_schema['dimensions']}次元（ミニロト最適化版）")
             
             if hasattr(self, 'pattern_stats') and self.pattern_stats:
                 print(f"平均合計値: {self.pattern_stats.get('avg_sum', 0):.1f}")
@@ -657,9 +2905,13 @@ class MiniLotoBasicPredictor:
                 'model_weights': self.model_weights,
                 'model_scores': self.model_scores,
                 'freq_counter': dict(self.freq_counter),
-                'pair_freq': dict(self.pair_freq),
+                'pair_freq': self.pair_freq.to_dict(),
                 'pattern_stats': self.pattern_stats,
                 'data_count': self.data_count,
+                'include_recency': self.include_recency,
+                'feature_schema_hash': MiniLotoFeatureEngine.schema_for_models(
+                    self.scalers, self.include_recency)['schema_hash'],
+                'estimators': MiniLotoEstimatorFactory.describe(self.trained_models),
                 'save_timestamp': datetime.now().isoformat()
             }
             
@@ -681,16 +2933,23 @@ class MiniLotoBasicPredictor:
                 print("📂 保存済みモデルが見つかりません")
                 return False
             
-            # モデルと関連データを復元
+            # 保存時の特徴量スキーマが現在のレジストリ（この予測器の構成）と異なれば学習済みモデルは使わない
             data = self.saved_model_data
+            expected_hash = MiniLotoFeatureEngine.feature_schema(include_recency=self.include_recency)['schema_hash']
+            if data.get('feature_schema_hash') != expected_hash:
+                print("⚠️ 特徴量スキーマが保存時と異なるため再学習が必要です")
+                return False
+            
+            # モデルと関連データを復元
             self.trained_models = data['trained_models']
             self.scalers = data['scalers']
             self.model_weights = data['model_weights']
             self.model_scores = data['model_scores']
             self.freq_counter = Counter(data['freq_counter'])
-            self.pair_freq = Counter(data['pair_freq'])
+            self.pair_freq = MiniLotoPairMatrix.from_dict(data['pair_freq'])
             self.pattern_stats = data['pattern_stats']
             self.data_count = data['data_count']
+            self.include_recency = data.get('include_recency', False)
             
             print(f"📂 基本モデルをメモリから読み込み完了")
             print(f"  学習データ数: {self.data_count}件")
@@ -748,7 +3007,8 @@ if test_result == "SUCCESS":
     if basic_system.trained_models:
         print(f"\n📊 パート1完了統計:")
         print(f"  学習データ数: {basic_system.data_count}件")
-        print(f"  特徴量次元: 14次元")
+        feature_schema = MiniLotoFeatureEngine.schema_for_models(basic_system.scalers, basic_system.include_recency)
+        print(f"  特徴量次元: {feature_schema['dimensions']}次元")
         print(f"  学習モデル数: {len(basic_system.trained_models)}個")
         print(f"  頻出数字数: {len(basic_system.freq_counter)}個")
 else:
@@ -794,7 +3054,7 @@ class MiniLotoTimeSeriesValidator:
             'random_forest': RandomForestClassifier(
                 n_estimators=100, max_depth=10, random_state=42, n_jobs=-1
             ),
-            'gradient_boost': GradientBoostingClassifier(
+            'gradient_boost': MiniLotoEstimatorFactory.gradient_boost(
                 n_estimators=80, max_depth=6, random_state=42
             ),
             'neural_network': MLPClassifier(
@@ -808,6 +3068,21 @@ class MiniLotoTimeSeriesValidator:
             'neural_network': 0.25
         }
         
+        # 学習ターゲット形式（'multilabel': 1抽選1行の(N, 31)、'scalar': 従来の5行複製）
+        self.target_mode = 'multilabel'
+        # 鮮度特徴量ブロック（経過回数・出現回数・ホット/コールド）を追加するか
+        self.include_recency = False
+        # 特徴量・スケーリング済み行列・確率の型（'float32'でメモリ半減）
+        self.feature_dtype = MiniLotoFeatureEngine.default_dtype()
+        self.memory_stats = {}
+        # 構成モデルの並列学習（コア予算は環境変数 MINILOTO_CORES またはCPU数）
+        self.parallel_trainer = MiniLotoParallelTrainer()
+        # 予測セット生成（mode='expected'で抽出なしの期待票数）
+        self.prediction_engine = MiniLotoPredictionEngine(dtype=self.feature_dtype)
+        
+        # ミニロト用基準特徴量（14次元）
+        self.base_features = MiniLotoFeatureEngine.baseline_row()
+        
     def evaluate_prediction_sets(self, predicted_sets, actual):
         """20セット予測と実際の一致を評価"""
         results = []
@@ -847,78 +3122,22 @@ class MiniLotoTimeSeriesValidator:
         return summary
     
     def create_validation_features(self, data):
-        """ミニロト用14次元フル特徴量を作成"""
+        """ミニロト用14次元フル特徴量を作成（ターゲット形式はself.target_mode）"""
         try:
-            features = []
-            targets = []
             freq_counter = Counter()
-            pair_freq = Counter()
-            main_cols = ['第1数字', '第2数字', '第3数字', '第4数字', '第5数字']
+            store = MiniLotoDrawStore.from_data(data)
             
-            for i in range(len(data)):
-                try:
-                    current = []
-                    for col in main_cols:
-                        if col in data.columns:
-                            current.append(int(data.iloc[i][col]))
-                    
-                    if len(current) != 5:
-                        continue
-                    
-                    if not all(1 <= x <= 31 for x in current):
-                        continue
-                    if len(set(current)) != 5:
-                        continue
-                    
-                    # 基本統計
-                    for num in current:
-                        freq_counter[num] += 1
-                    
-                    # ペア分析
-                    for j in range(len(current)):
-                        for k in range(j+1, len(current)):
-                            pair = tuple(sorted([current[j], current[k]]))
-                            pair_freq[pair] += 1
-                    
-                    # ミニロト用14次元特徴量
-                    sorted_nums = sorted(current)
-                    gaps = [sorted_nums[j+1] - sorted_nums[j] for j in range(4)]
-                    
-                    feat = [
-                        float(np.mean(current)),           # 1. 平均値
-                        float(np.std(current)),            # 2. 標準偏差
-                        float(np.sum(current)),            # 3. 合計値
-                        float(sum(1 for x in current if x % 2 == 1)),  # 4. 奇数個数
-                        float(max(current)),               # 5. 最大値
-                        float(min(current)),               # 6. 最小値
-                        float(np.median(current)),         # 7. 中央値
-                        float(max(current) - min(current)), # 8. 範囲
-                        float(len([j for j in range(len(sorted_nums)-1) 
-                                 if sorted_nums[j+1] - sorted_nums[j] == 1])), # 9. 連続数
-                        float(current[0]),                 # 10. 第1数字
-                        float(current[2]),                 # 11. 第3数字（中央）
-                        float(current[4]),                 # 12. 第5数字（最後）
-                        float(np.mean(gaps)),              # 13. 平均ギャップ
-                        float(len([x for x in current if x <= 15])), # 14. 小数字数
-                    ]
-                    
-                    # 次回予測ターゲット
-                    if i < len(data) - 1:
-                        next_nums = []
-                        for col in main_cols:
-                            if col in data.columns:
-                                next_nums.append(int(data.iloc[i+1][col]))
-                        
-                        if len(next_nums) == 5:
-                            for target_num in next_nums:
-                                features.append(feat.copy())
-                                targets.append(target_num)
-                        
-                except Exception as e:
-                    continue
+            # 基本統計（頻出カウント）を一括集計
+            freq_counter.update(store.number_counts())
+            
+            # 14次元特徴量と次回予測ターゲットを一括計算
+            features, targets = MiniLotoFeatureEngine.training_set(
+                store, target_mode=self.target_mode, include_recency=self.include_recency,
+                dtype=self.feature_dtype
+            )
             
             print(f"✅ 14次元特徴量完成: {len(features)}個")
-            return np.array(features), np.array(targets), freq_counter
+            return features, targets, freq_counter
             
         except Exception as e:
             print(f"❌ 特徴量エンジニアリングエラー: {e}")
@@ -929,32 +3148,36 @@ class MiniLotoTimeSeriesValidator:
         try:
             # 14次元特徴量作成
             X, y, freq_counter = self.create_validation_features(train_data)
-            if X is None or len(X) < 50:  # 最低限必要なデータ数
+            if MiniLotoFeatureEngine.sample_count(X, y) < 50:  # 最低限必要なデータ数
                 return None
             
             trained_models = {}
             scalers = {}
             
-            for name, model in self.validation_models.items():
-                try:
-                    # スケーリング
-                    scaler = StandardScaler()
-                    X_scaled = scaler.fit_transform(X)
-                    
-                    # 学習
-                    model_copy = type(model)(**model.get_params())
-                    model_copy.fit(X_scaled, y)
-                    
+            # スケーリング（フォールドごとに1回、3モデルで共有）
+            scaler = StandardScaler()
+            X_scaled = scaler.fit_transform(X)
+            
+            # 3モデルを並列学習（元のモデルは複製して学習）
+            results = self.parallel_trainer.fit(self.validation_models, X_scaled, y)
+            
+            for name, (model_copy, _, error) in results.items():
+                if error is None:
                     trained_models[name] = model_copy
                     scalers[name] = scaler
-                    
-                except Exception as e:
-                    continue
             
             return {
                 'models': trained_models, 
                 'scalers': scalers,
-                'freq_counter': freq_counter
+                'freq_counter': freq_counter,
+                # 時間予算で打ち切り・除外されたモデルとその理由
+                'member_report': {
+                    name: report for name, report in self.parallel_trainer.last_report.items()
+                    if report['status'] != 'complete'
+                },
+                'prediction_row': MiniLotoFeatureEngine.prediction_row(
+                    self.base_features, train_data, self.include_recency
+                )
             }
             
         except Exception as e:
@@ -969,55 +3192,18 @@ class MiniLotoTimeSeriesValidator:
             trained_models = model_data['models']
             scalers = model_data['scalers']
             
-            # ミニロト用基準特徴量（14次元）
-            base_features = [16.0, 6.0, 80.0, 2.5, 28.0, 5.0, 16.0, 23.0, 1.0, 8.0, 16.0, 24.0, 5.5, 2.5]
+            # ミニロト用基準特徴量（14次元 + 有効時は訓練区間最新回の鮮度ブロック）
+            base_features = model_data.get('prediction_row', self.base_features)
             
-            predictions = []
+            # 基準特徴量のスケーリングは予測呼び出しごとに1回（全セット・全モデルで再利用）
+            scaled_rows = MiniLotoFeatureEngine.scale_rows(scalers, base_features, self.feature_dtype)
             
-            for i in range(count):
-                # 各モデルの予測を収集
-                ensemble_votes = Counter()
-                
-                for name, model in trained_models.items():
-                    try:
-                        scaler = scalers[name]
-                        X_scaled = scaler.transform([base_features])
-                        
-                        # 複数回予測
-                        for _ in range(6):
-                            if hasattr(model, 'predict_proba'):
-                                proba = model.predict_proba(X_scaled)[0]
-                                classes = model.classes_
-                                if len(classes) > 0:
-                                    selected = np.random.choice(classes, p=proba/proba.sum())
-                                    if 1 <= selected <= 31:
-                                        weight = self.model_weights.get(name, 0.33)
-                                        ensemble_votes[int(selected)] += weight
-                            else:
-                                pred = model.predict(X_scaled)[0]
-                                if 1 <= pred <= 31:
-                                    weight = self.model_weights.get(name, 0.33)
-                                    ensemble_votes[int(pred)] += weight
-                                    
-                    except Exception as e:
-                        continue
-                
-                # 頻出数字と組み合わせ
-                frequent_nums = [num for num, _ in freq_counter.most_common(12)]
-                for num in frequent_nums[:8]:
-                    ensemble_votes[num] += 0.1
-                
-                # 上位5個を選択
-                top_numbers = [num for num, _ in ensemble_votes.most_common(5)]
-                
-                # 不足分をランダム補完
-                while len(top_numbers) < 5:
-                    candidate = np.random.randint(1, 32)
-                    if candidate not in top_numbers:
-                        top_numbers.append(candidate)
-                
-                final_pred = sorted([int(x) for x in top_numbers[:5]])
-                predictions.append(final_pred)
+            # 全セット分の投票を一括計算（モデルごとの確率は1回、抽出は1回の乱数生成）
+            predictions = self.prediction_engine.predict(
+                trained_models, scaled_rows, self.model_weights, count,
+                samples_per_model=6,
+                boosts=[([num for num, _ in freq_counter.most_common(12)][:8], 0.1)]  # 頻出数字と組み合わせ
+            )
             
             return predictions
             
@@ -1029,46 +3215,58 @@ class MiniLotoTimeSeriesValidator:
 
 # ========================= パート2B開始 =========================
 
-    def fixed_window_validation(self, data, window_sizes=[30, 50, 70]):
-        """複数窓サイズによる固定窓検証（50回分メイン）"""
-        print(f"\n📊 === 固定窓検証開始（窓サイズ: {window_sizes}回） ===")
+    def _first_test_index(self, store, window_size, window_unit):
+        """窓の単位（回数・週数）に応じた最初の検証対象行"""
+        if window_unit == 'weeks':
+            if not store.has_dates:
+                return len(store)
+            first_date = store.date_index[0] + np.timedelta64(7 * window_size, 'D')
+            return store.date_bounds(start_date=first_date)[0]
+        return window_size
+    
+    def fixed_window_validation(self, data, window_sizes=[30, 50, 70], window_unit='rounds'):
+        """複数窓サイズによる固定窓検証（50回分メイン、window_unit='weeks'で週数指定の暦窓）"""
+        unit_label = '週' if window_unit == 'weeks' else '回'
+        print(f"\n📊 === 固定窓検証開始（窓サイズ: {window_sizes}{unit_label}） ===")
         print("⚡ フル精度モード: 3モデルアンサンブル・14次元特徴量")
         
-        total_rounds = len(data)
+        store = MiniLotoDrawStore.from_data(data)
+        store.ensure_features()  # 各foldは特徴量のスライスを使用（再計算なし）
+        total_rounds = len(store)
         results_by_window = {}
-        main_cols = ['第1数字', '第2数字', '第3数字', '第4数字', '第5数字']
-        round_col = '開催回'
         
         for window_size in window_sizes:
-            print(f"\n🔄 {window_size}回分窓での検証開始")
+            print(f"\n🔄 {window_size}{unit_label}分窓での検証開始")
             results = []
             
-            # 検証範囲の計算
-            max_tests = min(200, total_rounds - window_size - 1)  # 効率化のため200回まで
-            step = max(1, (total_rounds - window_size - 1) // max_tests)
+            # 検証範囲の計算（暦窓は開催日索引の二分探索で開始行を決定）
+            first_test = self._first_test_index(store, window_size, window_unit)
+            available = total_rounds - first_test - 1
+            if available <= 0:
+                print(f"❌ データ不足: {window_size}{unit_label}分窓の検証範囲がありません")
+                results_by_window[self._window_key(window_size, window_unit)] = results
+                continue
+            max_tests = min(200, available)  # 効率化のため200回まで
+            step = max(1, available // max_tests)
             
-            print(f"検証範囲: 第{window_size + 1}回 〜 第{total_rounds}回（{max_tests}回の検証、ステップ{step}）")
+            print(f"検証範囲: 第{first_test + 1}回 〜 第{total_rounds}回（{max_tests}回の検証、ステップ{step}）")
             
             test_count = 0
-            for i in range(0, total_rounds - window_size - 1, step):
+            for test_idx in range(first_test, total_rounds - 1, step):
                 if test_count >= max_tests:
                     break
                 
-                # 訓練データ: i〜i+window_size-1
-                train_start = i
-                train_end = i + window_size
-                test_idx = train_end
-                
-                if test_idx >= total_rounds:
-                    break
+                # 訓練データ: 回数窓はwindow_size行、暦窓は直近window_size週に入る行
+                if window_unit == 'weeks':
+                    train_start = store.weeks_start(test_idx, window_size)
+                else:
+                    train_start = test_idx - window_size
+                train_end = test_idx
                 
                 # 訓練データ取得
-                train_data = data.iloc[train_start:train_end]
-                test_round = data.iloc[test_idx][round_col]
-                actual_numbers = []
-                for col in main_cols:
-                    if col in data.columns:
-                        actual_numbers.append(int(data.iloc[test_idx][col]))
+                train_data = store.rows(train_start, train_end)
+                test_round = int(store.rounds[test_idx])
+                actual_numbers = store.numbers[test_idx].tolist()
                 
                 if len(actual_numbers) == 5:
                     # フルモデル学習
@@ -1088,6 +3286,10 @@ class MiniLotoTimeSeriesValidator:
                             eval_result['train_range'] = f"第{train_start + 1}回〜第{train_end}回"
                             eval_result['test_round'] = test_round
                             eval_result['window_size'] = window_size
+                            eval_result['window_unit'] = window_unit
+                            eval_result['train_size'] = len(train_data)
+                            eval_result['members'] = list(model_data['models'])
+                            eval_result['member_report'] = model_data['member_report']
                             
                             results.append(eval_result)
                 
@@ -1100,7 +3302,7 @@ class MiniLotoTimeSeriesValidator:
                         sets_3_plus = np.mean([r['sets_3_plus'] for r in results])
                         print(f"  進捗: {test_count}/{max_tests}件 | 平均一致: {avg_matches:.2f} | 3個以上一致: {sets_3_plus:.1f}セット")
             
-            results_by_window[window_size] = results
+            results_by_window[self._window_key(window_size, window_unit)] = results
             
             # 窓サイズ別サマリー
             if results:
@@ -1108,46 +3310,57 @@ class MiniLotoTimeSeriesValidator:
                 max_matches = max([r['max_matches'] for r in results])
                 sets_3_plus = np.mean([r['sets_3_plus'] for r in results])
                 sets_4_plus = np.mean([r['sets_4_plus'] for r in results])
-                print(f"\n📊 {window_size}回分窓 最終結果:")
+                print(f"\n📊 {window_size}{unit_label}分窓 最終結果:")
                 print(f"    検証回数: {len(results)}回 | 平均一致: {avg_matches:.3f}個 | 最高一致: {max_matches}個")
                 print(f"    3個以上一致: {sets_3_plus:.2f}セット | 4個以上一致: {sets_4_plus:.2f}セット")
         
-        self.fixed_window_results = results_by_window
+        # 回数窓・暦窓の結果を同じ辞書に保持して比較可能にする
+        self.fixed_window_results.update(results_by_window)
         return results_by_window
     
-    def expanding_window_validation(self, data, initial_size=50):
-        """累積窓による時系列交差検証（50回分初期サイズ）"""
-        print(f"\n📊 === 累積窓検証開始（初期サイズ: {initial_size}回） ===")
+    def _window_key(self, window_size, window_unit):
+        """結果辞書のキー（回数窓は従来どおり整数、暦窓は'26w'形式）"""
+        return f"{window_size}w" if window_unit == 'weeks' else window_size
+    
+    @staticmethod
+    def _window_label(window_key):
+        """結果辞書のキーから表示用の窓サイズ（'26w' → '26週'、50 → '50回'）"""
+        if isinstance(window_key, str) and window_key.endswith('w'):
+            return f"{int(window_key[:-1])}週"
+        return f"{int(window_key)}回"
+    
+    def expanding_window_validation(self, data, initial_size=50, window_unit='rounds'):
+        """累積窓による時系列交差検証（50回分初期サイズ、window_unit='weeks'で初期期間を週数指定）"""
+        unit_label = '週' if window_unit == 'weeks' else '回'
+        print(f"\n📊 === 累積窓検証開始（初期サイズ: {initial_size}{unit_label}） ===")
         print("⚡ フル精度モード: 3モデルアンサンブル・14次元特徴量")
         
         results = []
-        total_rounds = len(data)
-        main_cols = ['第1数字', '第2数字', '第3数字', '第4数字', '第5数字']
-        round_col = '開催回'
+        store = MiniLotoDrawStore.from_data(data)
+        store.ensure_features()  # 各foldは特徴量のスライスを使用（再計算なし）
+        total_rounds = len(store)
         
         # 効率化のため150回まで
-        max_tests = min(150, total_rounds - initial_size)
-        step = max(1, (total_rounds - initial_size) // max_tests)
+        first_test = self._first_test_index(store, initial_size, window_unit)
+        available = total_rounds - first_test
+        if available <= 0:
+            print("❌ データ不足: 累積窓の検証範囲がありません")
+            self.expanding_window_results = results
+            return results
+        max_tests = min(150, available)
+        step = max(1, available // max_tests)
         
-        print(f"検証範囲: 第{initial_size + 1}回 〜 第{total_rounds}回（{max_tests}回の検証、ステップ{step}）")
+        print(f"検証範囲: 第{first_test + 1}回 〜 第{total_rounds}回（{max_tests}回の検証、ステップ{step}）")
         
         test_count = 0
-        for i in range(0, total_rounds - initial_size, step):
+        for test_idx in range(first_test, total_rounds, step):
             if test_count >= max_tests:
                 break
-                
-            test_idx = initial_size + i
-            
-            if test_idx >= total_rounds:
-                break
             
             # 訓練データ: 0〜test_idx-1（累積）
-            train_data = data.iloc[0:test_idx]
-            test_round = data.iloc[test_idx][round_col]
-            actual_numbers = []
-            for col in main_cols:
-                if col in data.columns:
-                    actual_numbers.append(int(data.iloc[test_idx][col]))
+            train_data = store.rows(0, test_idx)
+            test_round = int(store.rounds[test_idx])
+            actual_numbers = store.numbers[test_idx].tolist()
             
             if len(actual_numbers) == 5:
                 # フルモデル学習
@@ -1167,6 +3380,8 @@ class MiniLotoTimeSeriesValidator:
                         eval_result['train_range'] = f"第1回〜第{test_idx}回"
                         eval_result['test_round'] = test_round
                         eval_result['train_size'] = len(train_data)
+                        eval_result['members'] = list(model_data['models'])
+                        eval_result['member_report'] = model_data['member_report']
                         
                         results.append(eval_result)
             
@@ -1203,16 +3418,17 @@ class MiniLotoTimeSeriesValidator:
         
         comparison_results = {}
         
-        # 固定窓（各サイズ）の統計
+        # 固定窓（各サイズ・回数窓と暦窓）の統計
         for window_size, results in self.fixed_window_results.items():
             if results:
                 avg_matches_list = [r['avg_matches'] for r in results]
                 max_matches_list = [r['max_matches'] for r in results]
                 sets_3_plus_list = [r['sets_3_plus'] for r in results]
                 sets_4_plus_list = [r['sets_4_plus'] for r in results]
+                window_label = self._window_label(window_size)
                 
                 stats = {
-                    'method': f'固定窓（{window_size}回）',
+                    'method': f'固定窓（{window_label}）',
                     'window_size': window_size,
                     'avg_matches': np.mean(avg_matches_list),
                     'std_matches': np.std(avg_matches_list),
@@ -1244,6 +3460,7 @@ class MiniLotoTimeSeriesValidator:
         # 結果表示
         print("\n【ミニロト時系列検証による詳細比較結果】")
         best_method = None
+        best_key = None
         best_score = 0
         
         for method_key, stats in comparison_results.items():
@@ -1261,6 +3478,7 @@ class MiniLotoTimeSeriesValidator:
             if score > best_score:
                 best_score = score
                 best_method = stats['method']
+                best_key = method_key
         
         # 最適手法の決定
         print(f"\n✅ 最適手法: {best_method}")
@@ -1286,9 +3504,9 @@ class MiniLotoTimeSeriesValidator:
         
         # 実用的な推奨事項
         print(f"\n🎯 実用的推奨事項:")
-        if best_method and 'fixed' in best_method:
-            window_size = [key for key, val in comparison_results.items() if val['method'] == best_method][0].split('_')[1]
-            print(f"   - 本番予測では過去{window_size}回分のデータでモデル学習")
+        if best_key and best_key.startswith('fixed_'):
+            window_size = comparison_results[best_key]['window_size']
+            print(f"   - 本番予測では過去{self._window_label(window_size)}分のデータでモデル学習")
             print(f"   - モデル重みを最適化結果に基づいて調整")
         
         return {
@@ -1317,7 +3535,7 @@ class MiniLotoAdvancedPredictor:
             'random_forest': RandomForestClassifier(
                 n_estimators=100, max_depth=10, random_state=42, n_jobs=-1
             ),
-            'gradient_boost': GradientBoostingClassifier(
+            'gradient_boost': MiniLotoEstimatorFactory.gradient_boost(
                 n_estimators=80, max_depth=6, random_state=42
             ),
             'neural_network': MLPClassifier(
@@ -1332,9 +3550,26 @@ class MiniLotoAdvancedPredictor:
             'neural_network': 0.25
         }
         
+        # 学習ターゲット形式（'multilabel': 1抽選1行の(N, 31)、'scalar': 従来の5行複製）
+        self.target_mode = 'multilabel'
+        # 鮮度特徴量ブロック（経過回数・出現回数・ホット/コールド）を追加するか
+        self.include_recency = False
+        # 特徴量・スケーリング済み行列・確率の型（'float32'でメモリ半減）
+        self.feature_dtype = MiniLotoFeatureEngine.default_dtype()
+        self.memory_stats = {}
+        # 構成モデルの並列学習（コア予算は環境変数 MINILOTO_CORES またはCPU数）
+        self.parallel_trainer = MiniLotoParallelTrainer()
+        # 予測セット生成（mode='expected'で抽出なしの期待票数）
+        self.prediction_engine = MiniLotoPredictionEngine(dtype=self.feature_dtype)
+        # 評価方式（'refit': 時系列CV + 全行で再学習、'fold_ensemble': フォールドモデルの平均を使用）
+        self.evaluation_mode = 'refit'
+        self.oof_predictions = {}
+        # 新規回のみの追加学習（定期的に全件再学習）
+        self.incremental_trainer = MiniLotoIncrementalTrainer('advanced')
+        
         # データ分析
         self.freq_counter = Counter()
-        self.pair_freq = Counter()
+        self.pair_freq = MiniLotoPairMatrix()
         self.pattern_stats = {}
         
         # 学習状態
@@ -1351,102 +3586,36 @@ class MiniLotoAdvancedPredictor:
         print("✅ 高度予測システム初期化完了")
         
     def create_advanced_features(self, data):
-        """高度な14次元特徴量エンジニアリング"""
+        """高度な14次元特徴量エンジニアリング（ターゲット形式はself.target_mode）"""
         try:
             print("🔧 高度14次元特徴量エンジニアリング開始")
             
-            features = []
-            targets = []
-            main_cols = ['第1数字', '第2数字', '第3数字', '第4数字', '第5数字']
+            store = MiniLotoDrawStore.from_data(data)
             
-            for i in range(len(data)):
-                try:
-                    current = []
-                    for col in main_cols:
-                        if col in data.columns:
-                            current.append(int(data.iloc[i][col]))
-                    
-                    if len(current) != 5:
-                        continue
-                    
-                    if not all(1 <= x <= 31 for x in current):
-                        continue
-                    if len(set(current)) != 5:
-                        continue
-                    
-                    # 基本統計
-                    for num in current:
-                        self.freq_counter[num] += 1
-                    
-                    # ペア分析
-                    for j in range(len(current)):
-                        for k in range(j+1, len(current)):
-                            pair = tuple(sorted([current[j], current[k]]))
-                            self.pair_freq[pair] += 1
-                    
-                    # 高度14次元特徴量
-                    sorted_nums = sorted(current)
-                    gaps = [sorted_nums[j+1] - sorted_nums[j] for j in range(4)]
-                    
-                    feat = [
-                        float(np.mean(current)),           # 1. 平均値
-                        float(np.std(current)),            # 2. 標準偏差
-                        float(np.sum(current)),            # 3. 合計値
-                        float(sum(1 for x in current if x % 2 == 1)),  # 4. 奇数個数
-                        float(max(current)),               # 5. 最大値
-                        float(min(current)),               # 6. 最小値
-                        float(np.median(current)),         # 7. 中央値
-                        float(max(current) - min(current)), # 8. 範囲
-                        float(len([j for j in range(len(sorted_nums)-1) 
-                                 if sorted_nums[j+1] - sorted_nums[j] == 1])), # 9. 連続数
-                        float(current[0]),                 # 10. 第1数字
-                        float(current[2]),                 # 11. 第3数字（中央）
-                        float(current[4]),                 # 12. 第5数字（最後）
-                        float(np.mean(gaps)),              # 13. 平均ギャップ
-                        float(len([x for x in current if x <= 15])), # 14. 小数字数
-                    ]
-                    
-                    # 次回予測ターゲット
-                    if i < len(data) - 1:
-                        next_nums = []
-                        for col in main_cols:
-                            if col in data.columns:
-                                next_nums.append(int(data.iloc[i+1][col]))
-                        
-                        if len(next_nums) == 5:
-                            for target_num in next_nums:
-                                features.append(feat.copy())
-                                targets.append(target_num)
-                        
-                except Exception as e:
-                    continue
-                
-                if (i + 1) % 100 == 0:
-                    print(f"  特徴量進捗: {i+1}/{len(data)}件")
+            # 基本統計（頻出カウント）を一括集計
+            self.freq_counter.update(store.number_counts())
+            
+            # ペア分析（有効行のみ、31×31共起行列に一括加算）
+            self.pair_freq.add_draws(store.clean_numbers)
+            
+            # 14次元特徴量と次回予測ターゲットを一括計算
+            features, targets = MiniLotoFeatureEngine.training_set(
+                store, target_mode=self.target_mode, include_recency=self.include_recency,
+                dtype=self.feature_dtype
+            )
             
             # パターン統計
             if len(features) > 0:
-                sum_patterns = []
-                for i in range(len(data)):
-                    try:
-                        current = []
-                        for col in main_cols:
-                            if col in data.columns:
-                                current.append(int(data.iloc[i][col]))
-                        if len(current) == 5 and all(1 <= x <= 31 for x in current) and len(set(current)) == 5:
-                            sum_patterns.append(sum(current))
-                    except:
-                        continue
-                
-                if sum_patterns:
+                sum_stats = store.sum_stats()
+                if sum_stats is not None:
                     self.pattern_stats = {
-                        'avg_sum': float(np.mean(sum_patterns)),
-                        'std_sum': float(np.std(sum_patterns)),
+                        'avg_sum': sum_stats[0],
+                        'std_sum': sum_stats[1],
                         'most_frequent_pairs': self.pair_freq.most_common(10)
                     }
             
             print(f"✅ 高度14次元特徴量完成: {len(features)}個")
-            return np.array(features), np.array(targets)
+            return features, targets
             
         except Exception as e:
             print(f"❌ 特徴量エンジニアリングエラー: {e}")
@@ -1459,46 +3628,96 @@ class MiniLotoAdvancedPredictor:
             
             # 高度14次元特徴量作成
             X, y = self.create_advanced_features(data)
-            if X is None or len(X) < 100:
-                print(f"❌ 特徴量不足: {len(X) if X is not None else 0}件")
+            sample_count = MiniLotoFeatureEngine.sample_count(X, y)
+            if sample_count < 100:
+                print(f"❌ 特徴量不足: {sample_count}件")
                 return False
             
             self.data_count = len(data)
             
+            # スケーリング（全モデルで共有する1個のスケーラーと1個のスケール済み行列）
+            scaler = StandardScaler()
+            X_scaled = scaler.fit_transform(X)
+            scaled_bytes = X_scaled.nbytes
+            
             # 各モデルの学習
             print("🤖 高度アンサンブルモデル学習中...")
             
-            for name, model in self.models.items():
-                try:
-                    print(f"  {name} 学習中...")
-                    
-                    # スケーリング
-                    scaler = StandardScaler()
-                    X_scaled = scaler.fit_transform(X)
-                    self.scalers[name] = scaler
-                    
-                    # 学習
-                    model.fit(X_scaled, y)
-                    
-                    # クロスバリデーション評価
-                    cv_score = np.mean(cross_val_score(model, X_scaled, y, cv=3))
-                    
-                    self.trained_models[name] = model
+            print(f"  {', '.join(self.models)} 学習中...")
+            
+            # 構成モデルと時系列CVのフォールドを並列学習（(N, 31)ターゲットは数字別確率モデル）
+            results = self.parallel_trainer.fit(
+                self.models, X_scaled, y, cv=3, refit=self.evaluation_mode == 'refit'
+            )
+            self.oof_predictions = self.parallel_trainer.last_oof
+            
+            for name, (model, cv_score, error) in results.items():
+                if error is not None:
+                    print(f"    ❌ {name}: エラー {error}")
+                    continue
+                
+                self.scalers[name] = scaler
+                self.trained_models[name] = model
+                if cv_score is not None:
                     self.model_scores[name] = cv_score
-                    
                     print(f"    ✅ {name}: CV精度 {cv_score*100:.2f}%")
-                    
-                except Exception as e:
-                    print(f"    ❌ {name}: エラー {e}")
-                    continue
+                else:
+                    print(f"    ✅ {name}: CV精度 未評価（検証フォールドが時間予算内に終了せず）")
+                if self.parallel_trainer.last_report[name]['status'] == 'partial':
+                    print(f"    ⏱️ {name}: 時間予算で打ち切り（終了した学習分を使用）")
+            
+            if all(error is not None for _, _, error in results.values()):
+                print("❌ 高度アンサンブル学習失敗: 学習を終えたモデルがありません")
+                return False
             
             print(f"✅ 高度アンサンブル学習完了: {len(self.trained_models)}モデル")
+            self.memory_stats = self.training_memory_stats(X, y, scaled_bytes)
             return True
             
         except Exception as e:
             print(f"❌ 高度アンサンブル学習エラー: {str(e)}")
             return False
     
+    def training_memory_stats(self, X, y, scaled_bytes):
+        """学習時の段階別保持バイト数（実在する配列のみ、確率は時系列CVの検証区間確率）"""
+        store = getattr(self.data_fetcher, 'feature_store', None)
+        return {
+            'feature_store': MiniLotoFeatureEngine.nbytes(getattr(store, 'features', None)),
+            'features': MiniLotoFeatureEngine.nbytes(X),
+            'targets': MiniLotoFeatureEngine.nbytes(y),
+            'scaled': scaled_bytes,
+            'probabilities': MiniLotoFeatureEngine.nbytes(self.oof_predictions),
+        }
+    
+    def memory_report(self):
+        """直近の学習で保持した配列のバイト数を段階別に表示"""
+        if not self.memory_stats:
+            print("📝 メモリ統計なし（学習後に利用可能）")
+            return {}
+        return MiniLotoFeatureEngine.memory_report(self.memory_stats, f"メモリ使用量（{self.feature_dtype}）")
+    
+    def predict_scenarios(self, grid):
+        """シナリオ格子（例: {'合計値': [70, 80, 90], '奇数個数': [2, 3]}）を一括推論し、シナリオ別の確率と予測セットを返す"""
+        try:
+            if not self.trained_models:
+                print("❌ 学習済みモデルがありません")
+                return None
+            
+            scenarios, rows = MiniLotoFeatureEngine.scenario_grid(grid)
+            rows = MiniLotoFeatureEngine.prediction_rows(
+                rows, self.data_fetcher.get_draw_store(), self.include_recency
+            )
+            result = self.prediction_engine.predict_scenarios(
+                self.trained_models, self.scalers, self.model_weights, rows, self.feature_dtype
+            )
+            result['scenarios'] = scenarios
+            print(f"✅ シナリオ一括予測完了: {len(scenarios)}シナリオ × {len(result['models'])}モデル")
+            return result
+            
+        except Exception as e:
+            print(f"❌ シナリオ予測エラー: {e}")
+            return None
+    
     def advanced_predict(self, count=20):
         """高度アンサンブル予測実行（3モデル）"""
         try:
@@ -1509,58 +3728,25 @@ class MiniLotoAdvancedPredictor:
             # 基準特徴量（高度版）
             if hasattr(self, 'pattern_stats') and self.pattern_stats:
                 avg_sum = self.pattern_stats.get('avg_sum', 80)
-                base_features = [
-                    avg_sum / 5, 6.0, avg_sum, 2.5, 28.0, 5.0, 16.0, 23.0, 1.0, 8.0, 16.0, 24.0, 5.5, 2.5
-                ]
+                base_features = MiniLotoFeatureEngine.baseline_row({'平均値': avg_sum / 5, '合計値': avg_sum})
             else:
-                base_features = [16.0, 6.0, 80.0, 2.5, 28.0, 5.0, 16.0, 23.0, 1.0, 8.0, 16.0, 24.0, 5.5, 2.5]
+                base_features = MiniLotoFeatureEngine.baseline_row()
             
-            predictions = []
+            # 鮮度特徴量ブロック（学習時に有効化した場合のみ最新回分を付加）
+            base_features = MiniLotoFeatureEngine.prediction_row(
+                base_features, self.data_fetcher.get_draw_store(), self.include_recency
+            )
             
-            for i in range(count):
-                # 各モデルの予測を収集
-                ensemble_votes = Counter()
-                
-                for name, model in self.trained_models.items():
-                    try:
-                        scaler = self.scalers[name]
-                        X_scaled = scaler.transform([base_features])
-                        
-                        # 複数回予測
-                        for _ in range(8):  # 高度版では多めに予測
-                            if hasattr(model, 'predict_proba'):
-                                proba = model.predict_proba(X_scaled)[0]
-                                classes = model.classes_
-                                if len(classes) > 0:
-                                    selected = np.random.choice(classes, p=proba/proba.sum())
-                                    if 1 <= selected <= 31:
-                                        weight = self.model_weights.get(name, 0.33)
-                                        ensemble_votes[int(selected)] += weight
-                            else:
-                                pred = model.predict(X_scaled)[0]
-                                if 1 <= pred <= 31:
-                                    weight = self.model_weights.get(name, 0.33)
-                                    ensemble_votes[int(pred)] += weight
-                                    
-                    except Exception as e:
-                        continue
-                
-                # 頻出数字と組み合わせ
-                frequent_nums = [num for num, _ in self.freq_counter.most_common(15)]
-                for num in frequent_nums[:10]:
-                    ensemble_votes[num] += 0.12
-                
-                # 上位5個を選択
-                top_numbers = [num for num, _ in ensemble_votes.most_common(5)]
-                
-                # 不足分をランダム補完
-                while len(top_numbers) < 5:
-                    candidate = np.random.randint(1, 32)
-                    if candidate not in top_numbers:
-                        top_numbers.append(candidate)
-                
-                final_pred = sorted([int(x) for x in top_numbers[:5]])
-                predictions.append(final_pred)
+            # 基準特徴量のスケーリングは予測呼び出しごとに1回（全セット・全モデルで再利用）
+            scaled_rows = MiniLotoFeatureEngine.scale_rows(self.scalers, base_features, self.feature_dtype)
+            
+            # 全セット分の投票を一括計算（モデルごとの確率は1回、抽出は1回の乱数生成）
+            predictions = self.prediction_engine.predict(
+                self.trained_models, scaled_rows, self.model_weights, count,
+                samples_per_model=8,  # 高度版では多めに予測
+                boosts=[([num for num, _ in self.freq_counter.most_common(15)][:10], 0.12)],  # 頻出数字と組み合わせ
+                pair_counts=self.pair_freq.counts, pattern_stats=self.pattern_stats
+            )
             
             return predictions
             
@@ -1582,8 +3768,8 @@ class MiniLotoAdvancedPredictor:
             # バリデーター初期化
             self.validator = MiniLotoTimeSeriesValidator()
             
-            # データ準備
-            data = self.data_fetcher.latest_data
+            # データ準備（列指向ストア）
+            data = self.data_fetcher.get_draw_store()
             
             # 1. 固定窓検証（30, 50, 70回分）
             fixed_results = self.validator.fixed_window_validation(data)
@@ -1625,8 +3811,9 @@ class MiniLotoAdvancedPredictor:
             self.model_weights['gradient_boost'] *= (1 + adjustment_rate)
             self.model_weights['random_forest'] *= (1 - adjustment_rate * 0.5)
         
-        # Neural Networkが有効な場合は重みを維持
-        if 'neural_network' in self.model_scores and self.model_scores['neural_network'] > 0.3:
+        # Neural Networkが有効な場合は重みを維持（スコアは上位5数字の的中率、偶然水準5/31の1.2倍超で有効）
+        chance_rate = 5 / 31
+        if (self.model_scores.get('neural_network') or 0) > chance_rate * 1.2:
             print("🧠 Neural Network性能良好のため重みを維持")
         
         # 重みの正規化
@@ -1680,15 +3867,16 @@ def run_miniloto_advanced_prediction():
         
         # データ取得確認
         if not advanced_system.data_fetcher.latest_data is None:
-            training_data = advanced_system.data_fetcher.latest_data
+            training_data = advanced_system.data_fetcher.get_draw_store()
         else:
             print("📊 データ取得が必要です")
             if not advanced_system.data_fetcher.fetch_latest_data():
                 return "FAILED"
-            training_data = advanced_system.data_fetcher.latest_data
+            training_data = advanced_system.data_fetcher.get_draw_store()
         
-        # 高度モデル学習
-        success = advanced_system.train_advanced_models(training_data)
+        # 高度モデル学習（学習状態を記録し、パート3では再利用・追加学習のみ）
+        success = advanced_system.incremental_trainer.ensure(
+            advanced_system, training_data, advanced_system.train_advanced_models)
         if not success:
             return "FAILED"
         
@@ -1757,7 +3945,8 @@ if test_result == "SUCCESS":
         if advanced_system.trained_models:
             print(f"\n📊 パート2完了統計:")
             print(f"  学習データ数: {advanced_system.data_count}件")
-            print(f"  特徴量次元: 14次元（高度版）")
+            feature_schema = MiniLotoFeatureEngine.schema_for_models(advanced_system.scalers, advanced_system.include_recency)
+            print(f"  特徴量次元: {feature_schema['dimensions']}次元（高度版）")
             print(f"  学習モデル数: {len(advanced_system.trained_models)}個（3モデルアンサンブル）")
             print(f"  頻出数字数: {len(advanced_system.freq_counter)}個")
             print(f"  時系列検証: 完了")
@@ -1813,15 +4002,13 @@ print("="*80)
             print(f"\n🆕 第{next_round}回の新規予測を開始します")
             
             # 4. 前回結果との照合・学習
-            learning_applied = self.check_and_apply_learning(latest_data, latest_round)
+            learning_applied = self.check_and_apply_learning(self.data_fetcher.get_draw_store(), latest_round)
             
-            # 5. モデル学習確認（必要に応じて再学習）
-            if not self.trained_models:
-                print("🔧 モデル学習が必要です")
-                success = self.train_models_if_needed(latest_data)
-                if not success:
-                    print("❌ モデル学習失敗")
-                    return [], {}
+            # 5. モデル学習確認（チェックポイント復元・新規回の追加学習・必要なら全件学習）
+            success = self.train_models_if_needed(self.data_fetcher.get_draw_store())
+            if not success:
+                print("❌ モデル学習失敗")
+                return [], {}
             
             # 6. 新しい予測生成
             predictions = self.predict_with_learning(20, use_learning=learning_applied)
@@ -1830,10 +4017,13 @@ print("="*80)
                 return [], {}
             
             # 7. 予測を永続化保存
+            feature_schema = MiniLotoFeatureEngine.schema_for_models(self.scalers, self.include_recency)
             metadata = {
                 'learning_applied': learning_applied,
                 'model_count': len(self.trained_models),
-                'feature_dimensions': 14,
+                'feature_dimensions': feature_schema['dimensions'],
+                'feature_schema_hash': feature_schema['schema_hash'],
+                'estimators': MiniLotoEstimatorFactory.describe(self.trained_models),
                 'data_count': self.data_count,
                 'model_weights': self.model_weights.copy()
             }
@@ -1860,13 +4050,9 @@ print("="*80)
             return [], {}
     
     def train_models_if_needed(self, data):
-        """必要に応じてモデルを学習"""
-        if self.trained_models and len(self.trained_models) >= 2:
-            print("✅ 既存の学習済みモデルを使用")
-            return True
-        
-        # パート2の高度学習を実行
-        return advanced_system.train_advanced_models(data)
+        """必要に応じてモデルを学習（学習済みなら新規回のみ追加学習、定期的に全件再学習）"""
+        # パート2の高度学習モデル（学習済みモデルの辞書はパート2と共有）
+        return self.incremental_trainer.ensure(advanced_system, data, advanced_system.train_advanced_models)
     
     def display_existing_prediction(self, prediction_data, round_number):
         """既存の予測を表示"""
@@ -1921,7 +4107,8 @@ print("="*80)
         print("\n" + "="*80)
         print("📊 分析結果")
         print("="*80)
-        print(f"特徴量次元: 14次元（ミニロト最適化版）")
+        feature_schema = MiniLotoFeatureEngine.schema_for_models(self.scalers, self.include_recency)
+        print(f"特徴量次元: {feature_schema['dimensions']}次元（ミニロト最適化版）")
         
         if hasattr(self, 'pattern_stats') and self.pattern_stats:
             print(f"平均合計値: {self.pattern_stats.get('avg_sum', 0):.1f}")
@@ -2097,7 +4284,8 @@ if test_result == "SUCCESS":
         if integrated_system.trained_models:
             print(f"\n📊 パート3完了統計:")
             print(f"  学習データ数: {integrated_system.data_count}件")
-            print(f"  特徴量次元: 14次元（最終版）")
+            feature_schema = MiniLotoFeatureEngine.schema_for_models(integrated_system.scalers, integrated_system.include_recency)
+            print(f"  特徴量次元: {feature_schema['dimensions']}次元（最終版）")
             print(f"  学習モデル数: {len(integrated_system.trained_models)}個（3モデルアンサンブル）")
             print(f"  永続化予測数: {len(integrated_system.persistence.get_all_predictions())}件")
             print(f"  自動学習: 有効")
@@ -2141,37 +4329,31 @@ class MiniLotoAutoVerificationLearner:
         
         verified_count = 0
         total_improvements = []
-        main_cols = ['第1数字', '第2数字', '第3数字', '第4数字', '第5数字']
-        round_col = '開催回'
         
-        for entry in prediction_history.predictions:
-            if entry['verified']:
+        # 未照合エントリを開催回で一括結合
+        pending = [entry for entry in prediction_history.predictions if not entry['verified']]
+        store = MiniLotoDrawStore.from_data(latest_data)
+        rows = store.lookup_rows([entry['round'] for entry in pending])
+        
+        for entry, row in zip(pending, rows):
+            if row < 0:
                 continue
-                
-            # 該当する開催回のデータを検索
-            matching_data = latest_data[latest_data[round_col] == entry['round']]
-            
-            if len(matching_data) > 0:
-                actual_row = matching_data.iloc[0]
-                actual_numbers = []
-                for col in main_cols:
-                    if col in actual_row.index:
-                        actual_numbers.append(int(actual_row[col]))
-                
-                if len(actual_numbers) == 5:
-                    # 照合と分析
-                    verification_result = self._analyze_prediction(
-                        entry['predictions'], 
-                        actual_numbers,
-                        entry['round']
-                    )
-                    
-                    self.verification_results.append(verification_result)
-                    verified_count += 1
-                    
-                    # 学習改善
-                    improvements = self._improve_from_result(verification_result, actual_row, main_cols)
-                    total_improvements.extend(improvements)
+            
+            actual_numbers = store.numbers[row].tolist()
+            
+            # 照合と分析
+            verification_result = self._analyze_prediction(
+                entry['predictions'], 
+                actual_numbers,
+                entry['round']
+            )
+            
+            self.verification_results.append(verification_result)
+            verified_count += 1
+            
+            # 学習改善
+            improvements = self._improve_from_result(verification_result, actual_numbers)
+            total_improvements.extend(improvements)
         
         if verified_count > 0:
             print(f"\n✅ {verified_count}件の予測を照合・分析")
@@ -2224,7 +4406,7 @@ class MiniLotoAutoVerificationLearner:
                 count += 1
         return count
     
-    def _improve_from_result(self, verification_result, actual_row, main_cols):
+    def _improve_from_result(self, verification_result, actual_numbers):
         """照合結果から学習改善点を抽出"""
         improvements = []
         
@@ -2487,6 +4669,15 @@ class MiniLotoIntegratedSystem:
         self.trained_models = advanced_system.trained_models
         self.model_scores = advanced_system.model_scores
         self.data_count = advanced_system.data_count
+        self.target_mode = advanced_system.target_mode
+        self.include_recency = advanced_system.include_recency
+        self.feature_dtype = advanced_system.feature_dtype
+        self.parallel_trainer = advanced_system.parallel_trainer
+        self.prediction_engine = advanced_system.prediction_engine
+        # 購入口のポートフォリオ選択（enabled=Falseで従来の投票による予測）
+        self.portfolio_selector = MiniLotoPortfolioSelector()
+        self.evaluation_mode = advanced_system.evaluation_mode
+        self.incremental_trainer = advanced_system.incremental_trainer
         
         # パート3専用機能
         self.auto_learner = MiniLotoAutoVerificationLearner()
@@ -2511,27 +4702,13 @@ class MiniLotoIntegratedSystem:
             print(f"✅ 第{previous_round}回は既に学習済みです")
             return True
         
-        # 当選結果を最新データから取得
-        main_cols = ['第1数字', '第2数字', '第3数字', '第4数字', '第5数字']
-        round_col = '開催回'
-        
-        matching_data = latest_data[latest_data[round_col] == previous_round]
+        # 当選結果を最新データから取得（開催回索引でO(1)）
+        actual_numbers = MiniLotoDrawStore.from_data(latest_data).get_numbers(previous_round)
         
-        if len(matching_data) == 0:
+        if actual_numbers is None:
             print(f"📊 第{previous_round}回の当選結果がまだ未公開です")
             return False
         
-        # 当選番号を取得
-        actual_row = matching_data.iloc[0]
-        actual_numbers = []
-        for col in main_cols:
-            if col in actual_row.index:
-                actual_numbers.append(int(actual_row[col]))
-        
-        if len(actual_numbers) != 5:
-            print(f"❌ 第{previous_round}回の当選番号が不完全です")
-            return False
-        
         # 予測結果との照合
         print(f"\n🎯 第{previous_round}回の結果分析・学習を実行")
         print(f"当選番号: {actual_numbers}")
@@ -2651,6 +4828,28 @@ class MiniLotoIntegratedSystem:
         
         return pattern_analysis
     
+    def predict_scenarios(self, grid):
+        """シナリオ格子（例: {'合計値': [70, 80, 90], '奇数個数': [2, 3]}）を一括推論し、シナリオ別の確率と予測セットを返す"""
+        try:
+            if not self.trained_models:
+                print("❌ 学習済みモデルがありません")
+                return None
+            
+            scenarios, rows = MiniLotoFeatureEngine.scenario_grid(grid)
+            rows = MiniLotoFeatureEngine.prediction_rows(
+                rows, self.data_fetcher.get_draw_store(), self.include_recency
+            )
+            result = self.prediction_engine.predict_scenarios(
+                self.trained_models, self.scalers, self.model_weights, rows, self.feature_dtype
+            )
+            result['scenarios'] = scenarios
+            print(f"✅ シナリオ一括予測完了: {len(scenarios)}シナリオ × {len(result['models'])}モデル")
+            return result
+            
+        except Exception as e:
+            print(f"❌ シナリオ予測エラー: {e}")
+            return None
+    
     def predict_with_learning(self, count=20, use_learning=True):
         """学習改善を適用した予測"""
         try:
@@ -2676,70 +4875,52 @@ class MiniLotoIntegratedSystem:
                 target_sum = pattern_targets.get('avg_sum', 80)
                 target_odd = pattern_targets.get('avg_odd_count', 2.5)
                 target_small = pattern_targets.get('avg_small_count', 2.5)
-                base_features = [
-                    target_sum / 5, 6.0, target_sum, target_odd, 28.0, 5.0, 16.0, 23.0, 1.0, 8.0, 16.0, 24.0, 5.5, target_small
-                ]
+                base_features = MiniLotoFeatureEngine.baseline_row({
+                    '平均値': target_sum / 5, '合計値': target_sum,
+                    '奇数個数': target_odd, '小数字数': target_small
+                })
             else:
-                base_features = [16.0, 6.0, 80.0, 2.5, 28.0, 5.0, 16.0, 23.0, 1.0, 8.0, 16.0, 24.0, 5.5, 2.5]
+                base_features = MiniLotoFeatureEngine.baseline_row()
             
-            predictions = []
+            # 鮮度特徴量ブロック（学習時に有効化した場合のみ最新回分を付加）
+            base_features = MiniLotoFeatureEngine.prediction_row(
+                base_features, self.data_fetcher.get_draw_store(), self.include_recency
+            )
             
-            for i in range(count):
-                # 各モデルの予測を収集
-                ensemble_votes = Counter()
-                
-                for name, model in self.trained_models.items():
-                    try:
-                        scaler = self.scalers[name]
-                        X_scaled = scaler.transform([base_features])
-                        
-                        # 複数回予測
-                        for _ in range(8):
-                            if hasattr(model, 'predict_proba'):
-                                proba = model.predict_proba(X_scaled)[0]
-                                classes = model.classes_
-                                if len(classes) > 0:
-                                    selected = np.random.choice(classes, p=proba/proba.sum())
-                                    if 1 <= selected <= 31:
-                                        weight = self.model_weights.get(name, 0.33)
-                                        ensemble_votes[int(selected)] += weight
-                            else:
-                                pred = model.predict(X_scaled)[0]
-                                if 1 <= pred <= 31:
-                                    weight = self.model_weights.get(name, 0.33)
-                                    ensemble_votes[int(pred)] += weight
-                                    
-                    except Exception as e:
-                        continue
-                
-                # 頻出数字と組み合わせ
-                frequent_nums = [num for num, _ in self.freq_counter.most_common(15)]
-                for num in frequent_nums[:10]:
-                    ensemble_votes[num] += 0.12
-                
-                # 学習改善：頻繁に見逃す数字をブースト
-                for num in boost_numbers:
-                    if 1 <= num <= 31:
-                        ensemble_votes[num] += 0.25
-                        if i == 0:  # 最初の予測時のみ表示
-                            print(f"  💡 {num}番をブースト（頻出見逃し）")
-                
-                # 小数字ブースト
-                if small_boost > 2:
-                    for num in range(1, 16):
-                        ensemble_votes[num] += 0.05
-                
-                # 上位5個を選択
-                top_numbers = [num for num, _ in ensemble_votes.most_common(5)]
-                
-                # 不足分をランダム補完
-                while len(top_numbers) < 5:
-                    candidate = np.random.randint(1, 32)
-                    if candidate not in top_numbers:
-                        top_numbers.append(candidate)
-                
-                final_pred = sorted([int(x) for x in top_numbers[:5]])
-                predictions.append(final_pred)
+            # 基準特徴量のスケーリングは予測呼び出しごとに1回（全セット・全モデルで再利用）
+            scaled_rows = MiniLotoFeatureEngine.scale_rows(self.scalers, base_features, self.feature_dtype)
+            
+            # 学習パターンの制約（制約索引のビットマップで厳密に適用）
+            constraints = MiniLotoConstraintIndex.constraints_from_targets(pattern_targets, small_boost)
+            
+            # 学習改善：頻繁に見逃す数字をブースト
+            for num in boost_numbers:
+                if 1 <= num <= 31:
+                    print(f"  💡 {num}番をブースト（頻出見逃し）")
+            
+            # 全セット分の投票を一括計算（モデルごとの確率は1回、抽出は1回の乱数生成）
+            boosts = [
+                ([num for num, _ in self.freq_counter.most_common(15)][:10], 0.12),  # 頻出数字と組み合わせ
+                (boost_numbers, 0.25),
+            ]
+            if small_boost > 2:
+                boosts.append((range(1, 16), 0.05))  # 小数字ブースト
+            # ポートフォリオ選択（購入口全体で3-5個一致の確率を最大化）、無効時・失敗時は投票による予測
+            predictions = []
+            if self.portfolio_selector.enabled:
+                number_scores = self.prediction_engine.number_scores(
+                    self.trained_models, scaled_rows, self.model_weights, 8, boosts=boosts
+                )
+                if number_scores is not None:
+                    predictions = self.portfolio_selector.select(
+                        number_scores, count, self.pair_freq.counts, self.pattern_stats, constraints
+                    )
+            if not predictions:
+                predictions = self.prediction_engine.predict(
+                    self.trained_models, scaled_rows, self.model_weights, count,
+                    samples_per_model=8, boosts=boosts,
+                    pair_counts=self.pair_freq.counts, pattern_stats=self.pattern_stats, constraints=constraints
+                )
             
             return predictions
             
@@ -2808,11 +4989,11 @@ def run_miniloto_timeseries_validation_final():
         
         # データ確認
         if not final_system.data_fetcher.latest_data is None:
-            data = final_system.data_fetcher.latest_data
+            data = final_system.data_fetcher.get_draw_store()
         else:
             if not final_system.data_fetcher.fetch_latest_data():
                 return "FAILED"
-            data = final_system.data_fetcher.latest_data
+            data = final_system.data_fetcher.get_draw_store()
         
         # バリデーター実行
         from __main__ import MiniLotoTimeSeriesValidator
@@ -3208,7 +5389,8 @@ if final_test_result == "SUCCESS":
         print(f"\n📊 ミニロト予測システム完全版 最終統計:")
         print(f"  システム名: MiniLoto_Final_v1.0")
         print(f"  学習データ数: {final_system.data_count}件")
-        print(f"  特徴量次元: 14次元（ミニロト完全最適化）")
+        feature_schema = MiniLotoFeatureEngine.schema_for_models(final_system.scalers, final_system.include_recency)
+        print(f"  特徴量次元: {feature_schema['dimensions']}次元（ミニロト完全最適化）")
         print(f"  学習モデル数: {len(final_system.trained_models)}個")
         print(f"  永続化予測数: {len(final_system.persistence.get_all_predictions())}件")
         print(f"  システム状態: {'正常' if final_system.system_ready else '要注意'}")
@@ -3282,20 +5464,14 @@ print("="*80)
                 print(f"✅ 第{current_round}回は既に学習適用済み")
                 return True
             
-            # 当選結果確認
-            main_cols = ['第1数字', '第2数字', '第3数字', '第4数字', '第5数字']
-            round_col = '開催回'
+            # 当選結果確認（開催回索引でO(1)）
+            actual_numbers = MiniLotoDrawStore.from_data(latest_data).get_numbers(current_round)
             
-            matching_data = latest_data[latest_data[round_col] == current_round]
-            
-            if len(matching_data) == 0:
+            if actual_numbers is None:
                 print(f"📊 第{current_round}回の当選結果未公開")
                 return False
             
             # 詳細学習分析実行
-            actual_row = matching_data.iloc[0]
-            actual_numbers = [int(actual_row[col]) for col in main_cols if col in actual_row.index]
-            
             if len(actual_numbers) == 5:
                 print(f"🎯 第{current_round}回学習分析実行: {actual_numbers}")
                 
@@ -3451,22 +5627,20 @@ print("="*80)
     def _ensure_models_ready(self, data):
         """最終モデル準備確保"""
         try:
-            if self.trained_models and len(self.trained_models) >= 2:
-                print("✅ 既存モデルを使用")
-                return True
-            
-            print("🔧 モデル学習が必要です...")
-            
-            # パート2の高度学習を使用
-            if hasattr(integrated_system, 'train_advanced_models'):
-                success = integrated_system.train_advanced_models(data)
-                if success:
+            # パート2の高度学習を使用（学習済みなら新規回のみ追加学習）
+            if hasattr(integrated_system, 'train_models_if_needed'):
+                success = integrated_system.train_models_if_needed(data)
+                if success and len(integrated_system.trained_models) >= 2:
                     # モデルをコピー
                     self.trained_models = integrated_system.trained_models.copy()
                     self.scalers = integrated_system.scalers.copy()
                     self.model_scores = integrated_system.model_scores.copy()
                     return True
-            
+
+            if self.trained_models and len(self.trained_models) >= 2:
+                print("✅ 既存モデルを使用")
+                return True
+
             # フォールバック: クイック学習
             return self._quick_model_training()
             
@@ -3474,6 +5648,28 @@ print("="*80)
             print(f"❌ モデル準備エラー: {e}")
             return False
     
+    def predict_scenarios(self, grid):
+        """シナリオ格子（例: {'合計値': [70, 80, 90], '奇数個数': [2, 3]}）を一括推論し、シナリオ別の確率と予測セットを返す"""
+        try:
+            if not self.trained_models:
+                print("❌ 学習済みモデルがありません")
+                return None
+            
+            scenarios, rows = MiniLotoFeatureEngine.scenario_grid(grid)
+            rows = MiniLotoFeatureEngine.prediction_rows(
+                rows, self.data_fetcher.get_draw_store(), self.include_recency
+            )
+            result = self.prediction_engine.predict_scenarios(
+                self.trained_models, self.scalers, self.model_weights, rows, self.feature_dtype
+            )
+            result['scenarios'] = scenarios
+            print(f"✅ シナリオ一括予測完了: {len(scenarios)}シナリオ × {len(result['models'])}モデル")
+            return result
+            
+        except Exception as e:
+            print(f"❌ シナリオ予測エラー: {e}")
+            return None
+    
     def _generate_complete_predictions(self, count=20, use_learning=True):
         """完全版予測生成"""
         try:
@@ -3501,76 +5697,52 @@ print("="*80)
                 target_sum = pattern_targets.get('avg_sum', 80)
                 target_odd = pattern_targets.get('avg_odd_count', 2.5)
                 target_small = pattern_targets.get('avg_small_count', 2.5)
-                base_features = [
-                    target_sum / 5, 6.0, target_sum, target_odd, 28.0, 5.0, 16.0, 23.0, 1.0, 8.0, 16.0, 24.0, 5.5, target_small
-                ]
+                base_features = MiniLotoFeatureEngine.baseline_row({
+                    '平均値': target_sum / 5, '合計値': target_sum,
+                    '奇数個数': target_odd, '小数字数': target_small
+                })
                 print(f"📊 学習改善基準: 合計{target_sum:.0f}, 奇数{target_odd:.1f}, 小数字{target_small:.1f}")
             else:
                 # デフォルト基準特徴量
                 if hasattr(self, 'pattern_stats') and self.pattern_stats:
                     avg_sum = self.pattern_stats.get('avg_sum', 80)
-                    base_features = [avg_sum / 5, 6.0, avg_sum, 2.5, 28.0, 5.0, 16.0, 23.0, 1.0, 8.0, 16.0, 24.0, 5.5, 2.5]
+                    base_features = MiniLotoFeatureEngine.baseline_row({'平均値': avg_sum / 5, '合計値': avg_sum})
                 else:
-                    base_features = [16.0, 6.0, 80.0, 2.5, 28.0, 5.0, 16.0, 23.0, 1.0, 8.0, 16.0, 24.0, 5.5, 2.5]
+                    base_features = MiniLotoFeatureEngine.baseline_row()
             
-            predictions = []
+            # 鮮度特徴量ブロック（学習時に有効化した場合のみ最新回分を付加）
+            base_features = MiniLotoFeatureEngine.prediction_row(
+                base_features, self.data_fetcher.get_draw_store(), self.include_recency
+            )
             
-            for i in range(count):
-                # アンサンブル投票
-                ensemble_votes = Counter()
-                
-                # 各モデルの予測
-                for name, model in self.trained_models.items():
-                    try:
-                        scaler = self.scalers[name]
-                        X_scaled = scaler.transform([base_features])
-                        
-                        # 複数回予測で安定化
-                        for _ in range(10):  # 完全版では多めに予測
-                            if hasattr(model, 'predict_proba'):
-                                proba = model.predict_proba(X_scaled)[0]
-                                classes = model.classes_
-                                if len(classes) > 0:
-                                    selected = np.random.choice(classes, p=proba/proba.sum())
-                                    if 1 <= selected <= 31:
-                                        weight = self.model_weights.get(name, 0.33)
-                                        ensemble_votes[int(selected)] += weight
-                            else:
-                                pred = model.predict(X_scaled)[0]
-                                if 1 <= pred <= 31:
-                                    weight = self.model_weights.get(name, 0.33)
-                                    ensemble_votes[int(pred)] += weight
-                    except Exception as e:
-                        continue
-                
-                # 頻出数字ブースト
-                frequent_nums = [num for num, _ in self.freq_counter.most_common(15)]
-                for num in frequent_nums[:10]:
-                    ensemble_votes[num] += 0.15
-                
-                # 学習改善ブースト
-                if use_learning:
-                    # 見逃し番号ブースト
-                    for num in boost_numbers:
-                        if 1 <= num <= 31:
-                            ensemble_votes[num] += 0.3
-                    
-                    # 小数字ブースト
-                    if small_boost > 2:
-                        for num in range(1, 16):
-                            ensemble_votes[num] += 0.08
-                
-                # 上位5個選択
-                top_numbers = [num for num, _ in ensemble_votes.most_common(5)]
-                
-                # 不足分補完
-                while len(top_numbers) < 5:
-                    candidate = np.random.randint(1, 32)
-                    if candidate not in top_numbers:
-                        top_numbers.append(candidate)
-                
-                final_pred = sorted([int(x) for x in top_numbers[:5]])
-                predictions.append(final_pred)
+            # 基準特徴量のスケーリングは予測呼び出しごとに1回（全セット・全モデルで再利用）
+            scaled_rows = MiniLotoFeatureEngine.scale_rows(self.scalers, base_features, self.feature_dtype)
+            
+            # 学習パターンの制約（制約索引のビットマップで厳密に適用）
+            constraints = MiniLotoConstraintIndex.constraints_from_targets(pattern_targets, small_boost) if use_learning else {}
+            
+            # 全セット分の投票を一括計算（モデルごとの確率は1回、抽出は1回の乱数生成）
+            boosts = [([num for num, _ in self.freq_counter.most_common(15)][:10], 0.15)]  # 頻出数字ブースト
+            if use_learning:
+                boosts.append((boost_numbers, 0.3))  # 見逃し番号ブースト
+                if small_boost > 2:
+                    boosts.append((range(1, 16), 0.08))  # 小数字ブースト
+            # ポートフォリオ選択（購入口全体で3-5個一致の確率を最大化）、無効時・失敗時は投票による予測
+            predictions = []
+            if self.portfolio_selector.enabled:
+                number_scores = self.prediction_engine.number_scores(
+                    self.trained_models, scaled_rows, self.model_weights, 10, boosts=boosts
+                )
+                if number_scores is not None:
+                    predictions = self.portfolio_selector.select(
+                        number_scores, count, self.pair_freq.counts, self.pattern_stats, constraints
+                    )
+            if not predictions:
+                predictions = self.prediction_engine.predict(
+                    self.trained_models, scaled_rows, self.model_weights, count,
+                    samples_per_model=10, boosts=boosts,  # 完全版では多めに予測
+                    pair_counts=self.pair_freq.counts, pattern_stats=self.pattern_stats, constraints=constraints
+                )
             
             print(f"✅ 完全版予測生成完了: {len(predictions)}セット")
             return predictions
@@ -3581,11 +5753,14 @@ print("="*80)
     
     def _create_complete_metadata(self, learning_applied):
         """完全版メタデータ作成"""
+        feature_schema = MiniLotoFeatureEngine.schema_for_models(self.scalers, self.include_recency)
         metadata = {
             'system_version': 'MiniLoto_Final_v1.0',
             'learning_applied': learning_applied,
             'model_count': len(self.trained_models),
-            'feature_dimensions': 14,
+            'feature_dimensions': feature_schema['dimensions'],
+            'feature_schema_hash': feature_schema['schema_hash'],
+            'estimators': MiniLotoEstimatorFactory.describe(self.trained_models),
             'data_count': self.data_count,
             'model_weights': self.model_weights.copy(),
             'model_scores': self.model_scores.copy(),
@@ -3672,7 +5847,8 @@ print("="*80)
         print(f"\n" + "="*80)
         print("📊 データ分析結果")
         print("="*80)
-        print(f"特徴量次元: 14次元（ミニロト完全最適化版）")
+        feature_schema = MiniLotoFeatureEngine.schema_for_models(self.scalers, self.include_recency)
+        print(f"特徴量次元: {feature_schema['dimensions']}次元（ミニロト完全最適化版）")
         
         if hasattr(self, 'pattern_stats') and self.pattern_stats:
             print(f"データ統計: 平均合計{self.pattern_stats.get('avg_sum', 0):.1f}")
@@ -3846,6 +6022,13 @@ class MiniLotoFinalSystem:
         self.pair_freq = integrated_system.pair_freq
         self.pattern_stats = integrated_system.pattern_stats
         self.data_count = integrated_system.data_count
+        self.target_mode = integrated_system.target_mode
+        self.include_recency = integrated_system.include_recency
+        self.feature_dtype = integrated_system.feature_dtype
+        self.parallel_trainer = integrated_system.parallel_trainer
+        self.prediction_engine = integrated_system.prediction_engine
+        self.portfolio_selector = integrated_system.portfolio_selector
+        self.evaluation_mode = integrated_system.evaluation_mode
         
         # 高度機能
         self.auto_learner = integrated_system.auto_learner
@@ -3942,6 +6125,9 @@ class MiniLotoFinalSystem:
                 if self.data_fetcher.fetch_latest_data():
                     print("✅ データ取得回復成功")
                     recovery_success = True
+                elif self.data_fetcher.use_cached_data():
+                    print("✅ キャッシュデータで回復")
+                    recovery_success = True
                 else:
                     print("❌ データ取得回復失敗")
             
@@ -3983,31 +6169,30 @@ class MiniLotoFinalSystem:
                 'random_forest': RandomForestClassifier(
                     n_estimators=50, max_depth=8, random_state=42, n_jobs=-1
                 ),
-                'gradient_boost': GradientBoostingClassifier(
+                'gradient_boost': MiniLotoEstimatorFactory.gradient_boost(
                     n_estimators=40, max_depth=4, random_state=42
                 )
             }
             
             # 簡易特徴量作成
-            X, y = self._create_simple_features(self.data_fetcher.latest_data)
-            if X is None or len(X) < 50:
+            X, y = self._create_simple_features(self.data_fetcher.get_draw_store())
+            if MiniLotoFeatureEngine.sample_count(X, y) < 50:
                 return False
             
+            # スケーリング（2モデルで共有）
+            scaler = StandardScaler()
+            X_scaled = scaler.fit_transform(X)
+            
             # 学習実行
-            for name, model in quick_models.items():
-                try:
-                    scaler = StandardScaler()
-                    X_scaled = scaler.fit_transform(X)
+            results = self.parallel_trainer.fit(
+                quick_models, X_scaled, y, cv=2, refit=self.evaluation_mode == 'refit'
+            )
+            for name, (model, cv_score, error) in results.items():
+                if error is None:
                     self.scalers[name] = scaler
-                    
-                    model.fit(X_scaled, y)
-                    cv_score = np.mean(cross_val_score(model, X_scaled, y, cv=2))
-                    
                     self.trained_models[name] = model
-                    self.model_scores[name] = cv_score
-                    
-                except Exception as e:
-                    continue
+                    if cv_score is not None:
+                        self.model_scores[name] = cv_score
             
             if self.trained_models:
                 self.model_weights = {
@@ -4024,48 +6209,11 @@ class MiniLotoFinalSystem:
     def _create_simple_features(self, data):
         """簡易特徴量作成（回復用）"""
         try:
-            features = []
-            targets = []
-            main_cols = ['第1数字', '第2数字', '第3数字', '第4数字', '第5数字']
-            
-            for i in range(min(len(data), 500)):  # 効率化のため500件まで
-                try:
-                    current = []
-                    for col in main_cols:
-                        if col in data.columns:
-                            current.append(int(data.iloc[i][col]))
-                    
-                    if len(current) != 5 or not all(1 <= x <= 31 for x in current) or len(set(current)) != 5:
-                        continue
-                    
-                    # 簡易8次元特徴量
-                    feat = [
-                        float(np.mean(current)),           # 平均値
-                        float(np.std(current)),            # 標準偏差
-                        float(np.sum(current)),            # 合計値
-                        float(sum(1 for x in current if x % 2 == 1)),  # 奇数個数
-                        float(max(current)),               # 最大値
-                        float(min(current)),               # 最小値
-                        float(max(current) - min(current)), # 範囲
-                        float(len([x for x in current if x <= 15])), # 小数字数
-                    ]
-                    
-                    # 次回予測ターゲット
-                    if i < len(data) - 1:
-                        next_nums = []
-                        for col in main_cols:
-                            if col in data.columns:
-                                next_nums.append(int(data.iloc[i+1][col]))
-                        
-                        if len(next_nums) == 5:
-                            for target_num in next_nums:
-                                features.append(feat.copy())
-                                targets.append(target_num)
-                        
-                except Exception as e:
-                    continue
-            
-            return np.array(features), np.array(targets)
+            # 簡易8次元特徴量（効率化のため500件まで）
+            return MiniLotoFeatureEngine.training_set(
+                data, simple=True, limit=500, target_mode=self.target_mode,
+                dtype=self.feature_dtype
+            )
             
         except Exception as e:
             return None, None
@@ -4115,10 +6263,10 @@ class MiniLotoFinalSystem:
             print(f"\n🆕 第{next_round}回の新規予測を生成します")
             
             # 5. 学習改善チェック
-            learning_applied = self._check_and_apply_complete_learning(latest_data, latest_round)
+            learning_applied = self._check_and_apply_complete_learning(self.data_fetcher.get_draw_store(), latest_round)
             
             # 6. 最終モデル確保
-            if not self._ensure_models_ready(latest_data):
+            if not self._ensure_models_ready(self.data_fetcher.get_draw_store()):
                 print("❌ モデル準備失敗")
                 return [], {}
             
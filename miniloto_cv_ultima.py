@@ -22,8 +22,13 @@ import json
 # ======================================================================
 
 class IncrementalTimeSeriesCV:
-    def __init__(self, save_interval=10):
+    def __init__(self, save_interval=10, feature_dtype=None):
         self.save_interval = save_interval  # 10件ごとに保存
+        # 特徴量行列の型（'float32'でメモリ半減、環境変数 MINILOTO_FLOAT32=1 でも有効）
+        if feature_dtype is None:
+            use_float32 = os.environ.get('MINILOTO_FLOAT32', '').lower() in ('1', 'true', 'yes')
+            feature_dtype = 'float32' if use_float32 else 'float64'
+        self.feature_dtype = feature_dtype
         self.cv_dir = "miniloto_models/cv_results"
         self.models_dir = "miniloto_models/models"
         
@@ -383,9 +388,17 @@ class IncrementalTimeSeriesCV:
                     # メタ情報
                     feature_version = features_data.get("feature_version", "unknown")
                     timestamp = features_data.get("timestamp", "unknown")
+                    # スキーマハッシュ（特徴量ファイルになければメインシステムの特徴量ストアから取得）
+                    self.feature_schema_hash = features_data.get("feature_schema_hash") or self._feature_store_schema_hash()
+                    # CVで実際に使うデータの内容（再生成・追記で変わる）
+                    self.feature_data_digest = self._feature_data_digest(X, y)
                     print(f"    📊 バージョン: {feature_version}")
                     print(f"    🕒 作成日時: {timestamp}")
                     print(f"    💾 使用ファイル: {file_path}")
+                    
+                    # 特徴量行列を指定の型に揃える（float32ならメモリ・キャッシュ帯域が半分）
+                    X = np.asarray(X).astype(self.feature_dtype, copy=False)
+                    print(f"    💾 メモリ: X {X.nbytes / 1024:.1f}KB ({X.dtype}), y {np.asarray(y).nbytes / 1024:.1f}KB")
                     print(f"    ✅ CV用データ準備完了: X{X.shape}, y{y.shape}")
                     
                     return X, y
@@ -598,12 +611,62 @@ class IncrementalTimeSeriesCV:
             print(f"❌ モデル読み込みエラー: {e}")
             return {}
     
+    # メインシステムの特徴量ストア（draw_features.pkl、特徴量スキーマハッシュを保持）
+    feature_store_paths = [
+        "/content/drive/MyDrive/miniloto_models/data_cache/draw_features.pkl",
+        "miniloto_models/data_cache/draw_features.pkl",
+    ]
+    
+    def _feature_store_schema_hash(self):
+        """メインシステムの特徴量ストアからスキーマハッシュを取得（なければNone）"""
+        for path in self.feature_store_paths:
+            try:
+                if os.path.exists(path):
+                    with open(path, 'rb') as f:
+                        store_data = pickle.load(f)
+                    if isinstance(store_data, dict) and store_data.get("schema_hash"):
+                        return store_data["schema_hash"]
+            except Exception:
+                continue
+        return None
+    
+    @staticmethod
+    def _feature_data_digest(X, y):
+        """特徴量データ(X, y)の形状・内容のダイジェスト（読み込み時の型で計算）"""
+        import hashlib
+        digest = hashlib.sha1()
+        for array in (X, y):
+            array = np.ascontiguousarray(array)
+            digest.update(f"{array.shape}{array.dtype.str}".encode())
+            digest.update(array.tobytes())
+        return digest.hexdigest()
+    
     def _calculate_feature_version(self):
-        """特徴量のバージョンを計算（ハッシュベース）"""
+        """特徴量のバージョンを計算（スキーマハッシュ + CVで使うデータ内容のハッシュ）"""
         try:
             import hashlib
-            # 特徴量ファイルの変更時刻ベースでバージョン計算
             features_file = "miniloto_models/features/features_cache.pkl"
+            
+            schema_hash = getattr(self, 'feature_schema_hash', None)
+            data_digest = getattr(self, 'feature_data_digest', None)
+            if (schema_hash is None or data_digest is None) and os.path.exists(features_file):
+                with open(features_file, 'rb') as f:
+                    features_data = pickle.load(f)
+                if isinstance(features_data, dict):
+                    if schema_hash is None:
+                        schema_hash = features_data.get("feature_schema_hash")
+                    if data_digest is None and "X" in features_data and "y" in features_data:
+                        data_digest = self._feature_data_digest(features_data["X"], features_data["y"])
+            if schema_hash is None:
+                schema_hash = self._feature_store_schema_hash()
+            self.feature_schema_hash = schema_hash
+            
+            # スキーマ（特徴量定義）とデータ内容のどちらが変わってもバージョンが変わる
+            if schema_hash or data_digest:
+                version_string = f"{schema_hash}:{data_digest}"
+                return hashlib.md5(version_string.encode()).hexdigest()[:8]
+            
+            # 特徴量ファイルの変更時刻ベースでバージョン計算
             if os.path.exists(features_file):
                 mtime = os.path.getmtime(features_file)
                 version_string = str(mtime)
@@ -2461,9 +2524,7 @@ class MainCVExecutor:
             # 現在の特徴量バージョン
             features_file = "miniloto_models/features/features_cache.pkl"
             if os.path.exists(features_file):
-                import hashlib
-                mtime = os.path.getmtime(features_file)
-                current_version = hashlib.md5(str(mtime).encode()).hexdigest()[:8]
+                current_version = self.cv_manager.cv_system._calculate_feature_version()
             else:
                 print("❌ 特徴量ファイルが見つかりません")
                 return False